@@ -59,8 +59,36 @@ Rank of node with key 8: 4
 Key at rank 2: 3
 """
 
+import mmap
+import os
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+
+from tree_stats import TreeStats
+
+# dump() file layout: magic, flags, number of nodes, then array("q") columns
+DUMP_HEADER = struct.Struct("=4sIQ")
+DUMP_MAGIC = b"DOST"
+DUMP_HAS_VALUES = 1
+
+
+def _int64_column(items: list, what: str) -> array:
+    # dump() stores every column as array("q")
+    try:
+        return array("q", items)
+    except (TypeError, OverflowError):
+        raise ValueError(
+            f"dump: {what} must be integers between -2**63 and 2**63 - 1"
+        ) from None
+
 
 class Node:
+    # Per-augmentation subtree aggregates, only set on augmented trees
+    aug: list | None = None
+
     def __init__(
         self,
         key: int | None,
@@ -69,53 +97,306 @@ class Node:
         left: "Node | None",
         right: "Node | None",
         size: int = 0,
+        count: int = 1,
+        value=None,
     ):
         self.key = key
+        self.value = value
         self.color = color
         self.parent = parent
         self.left = left
         self.right = right
+        # size counts every occurrence in the subtree, count only this key's
         self.size = size
+        self.count = count
 
 
-class RedBlackTree:
-    def __init__(self):
-        self.NIL = Node(
-            key=None, color="BLACK", parent=None, left=None, right=None, size=0
-        )
+# The sentinel is shared by every tree so that split and join can move
+# whole subtrees between trees without relinking their leaves. It is never
+# written to (deletes track the parent of a NIL child themselves), so
+# independent trees stay independent, also across threads.
+NIL = Node(
+    key=None,
+    color="BLACK",
+    parent=None,
+    left=None,
+    right=None,
+    size=0,
+    count=0,
+)
+
+
+class Augmentation(ABC):
+    # A subtree aggregate kept on every node of an augmented tree. value()
+    # is the node's own contribution and combine() merges two aggregates in
+    # key order; identity stands for an empty subtree. Aggregates are
+    # recomputed from the children on rotations and along the changed path
+    # of every insert and delete, so they are exact at all times. A
+    # subclass that leaves either method out cannot be instantiated.
+    name = ""
+    identity = None
+
+    @abstractmethod
+    def value(self, node: Node):
+        ...
+
+    @abstractmethod
+    def combine(self, a, b):
+        ...
+
+
+class SizeAugmentation(Augmentation):
+    name = "size"
+    identity = 0
+
+    def value(self, node: Node):
+        return node.count
+
+    def combine(self, a, b):
+        return a + b
+
+
+class SumAugmentation(Augmentation):
+    name = "sum"
+    identity = 0
+
+    def value(self, node: Node):
+        return node.value * node.count
+
+    def combine(self, a, b):
+        return a + b
+
+
+class MinAugmentation(Augmentation):
+    name = "min"
+
+    def value(self, node: Node):
+        return node.value if node.count else None
+
+    def combine(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return b if b < a else a
+
+
+class MaxAugmentation(Augmentation):
+    name = "max"
+
+    def value(self, node: Node):
+        return node.value if node.count else None
+
+    def combine(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return b if b > a else a
+
+
+class RedBlackTree(TreeStats):
+    def __init__(self, augmentations=()):
+        self.NIL = NIL
         self.root = self.NIL
+        self._augs = tuple(augmentations)
+        # Operation counters, None unless enable_stats() was called
+        self.stats: dict[str, int] | None = None
+        # Lazy deletion: the dead-node fraction that triggers a compaction,
+        # or None while deletes unlink nodes right away
+        self.lazy_delete: float | None = None
+        # Tombstones and live (count > 0) nodes; live is only kept up to
+        # date while lazy deletion is on, and recounted when it is enabled
+        self.dead = 0
+        self.live = 0
+
+    def enable_lazy_delete(self, max_dead_fraction: float = 0.25):
+        # From now on, removing the last occurrence of a key only leaves a
+        # tombstone: the node stays linked with count 0, so sizes, ranks
+        # and selects already skip it and no rotation is needed. Once the
+        # tombstones make up more than max_dead_fraction of the nodes, the
+        # tree is compacted in one O(n) rebuild.
+        if not 0 < max_dead_fraction <= 1:
+            raise ValueError("max_dead_fraction must be in (0, 1]")
+        if self.lazy_delete is None:
+            self.live = len(self._inorder_nodes())
+        self.lazy_delete = max_dead_fraction
+
+    def disable_lazy_delete(self):
+        self.lazy_delete = None
+        self.compact()
+
+    def compact(self):
+        # Drops the tombstones left by lazy deletes, e.g. when idle
+        if self.dead:
+            self._relink_live()
+
+    def _relink_live(self):
+        # Relinks the live nodes into a minimum-height tree in O(n)
+        nodes = self._inorder_nodes()
+        self.root = self._link_balanced(nodes)
+        self.dead = 0
+        self.live = len(nodes)
+
+    @classmethod
+    def from_keys(
+        cls, keys, presorted: bool = False, values=None, augmentations=()
+    ) -> "RedBlackTree":
+        # Builds the tree bottom-up in O(n) (plus the sort, unless the keys
+        # are already in order) instead of n inserts with fix-ups.
+        # values, if given, pairs up with keys; by default a key is its value.
+        keys = list(keys)
+        if values is not None:
+            values = list(values)
+            if len(values) != len(keys):
+                raise ValueError("from_keys: keys and values differ in length")
+
+        if presorted:
+            for i in range(1, len(keys)):
+                if keys[i] < keys[i - 1]:
+                    raise ValueError("from_keys: keys are not sorted")
+        elif values is None:
+            keys.sort()
+        else:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys = [keys[i] for i in order]
+            values = [values[i] for i in order]
+
+        if values is None:
+            values = keys
+
+        tree = cls(augmentations)
+        nil = tree.NIL
+        nodes: list[Node] = []
+        for key, value in zip(keys, values):
+            # Runs of equal keys collapse into one node with a multiplicity
+            if nodes and nodes[-1].key == key:
+                nodes[-1].count += 1
+                nodes[-1].value = value
+            else:
+                nodes.append(
+                    Node(
+                        key=key,
+                        color="BLACK",
+                        parent=None,
+                        left=nil,
+                        right=nil,
+                        value=value,
+                    )
+                )
+        tree.root = tree._link_balanced(nodes)
+        return tree
+
+    @classmethod
+    def from_sorted_runs(
+        cls, keys, counts, values=None, augmentations=()
+    ) -> "RedBlackTree":
+        # O(n) build from strictly increasing distinct keys and their
+        # multiplicities, e.g. the columns of a dump or a parallel build.
+        tree = cls(augmentations)
+        if values is None:
+            values = keys
+        nodes = [
+            Node(key, "BLACK", None, NIL, NIL, 0, count, value)
+            for key, count, value in zip(keys, counts, values)
+        ]
+        tree.root = tree._link_balanced(nodes)
+        return tree
+
+    def _link_balanced(self, nodes: list[Node]) -> Node:
+        # Links in-order nodes into a minimum-height tree. Every level is
+        # full except possibly the deepest one, so colouring the deepest
+        # level red and everything else black gives equal black heights.
+        if not nodes:
+            return self.NIL
+
+        nil = self.NIL
+        red_depth = len(nodes).bit_length() - 1
+        pull = self._pull if self._augs else None
+
+        def build(lo: int, hi: int, depth: int, parent: Node | None):
+            if lo >= hi:
+                return nil
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            node.parent = parent
+            node.left = build(lo, mid, depth + 1, node)
+            node.right = build(mid + 1, hi, depth + 1, node)
+            node.color = "RED" if depth == red_depth else "BLACK"
+            node.size = node.left.size + node.right.size + node.count
+            if pull is not None:
+                pull(node)
+            return node
 
-    def insert(self, key):
-        new_node = Node(
-            key=key, color="RED", parent=None, left=self.NIL, right=self.NIL
-        )
+        root = build(0, len(nodes), 0, None)
+        root.color = "BLACK"
+        return root
+
+    def insert(self, key, value=None):
+        # Without an explicit value a key maps to itself, as find always
+        # reported. Re-inserting a key overwrites its value when one is given.
+        stats = self.stats
+        if stats is not None:
+            stats["inserts"] += 1
+            rotations = stats["rotations"]
+        new_node = self._insert(key, value)
         # print("NN --> ", new_node.__dict__)
-        self._insert(new_node)
-        self._fix_insert(new_node)
-
-    def _insert(self, node: Node):
+        if new_node is not None:
+            self.live += 1
+            if self._augs:
+                self._pull_path(new_node)
+            self._fix_insert(new_node)
+        if stats is not None:
+            stats["insert_rotations"] += stats["rotations"] - rotations
+
+    def _insert(self, key, value) -> Node | None:
         y = None
         x = self.root
 
         while x != self.NIL:
+            # Every node on the descent path gains one more occurrence
+            x.size += 1
+            if key == x.key:
+                # Duplicates only bump the multiplicity of the existing node
+                x.count += 1
+                if x.count == 1:
+                    # A tombstone comes back to life with a fresh value
+                    self.dead -= 1
+                    self.live += 1
+                    x.value = key if value is None else value
+                elif value is not None:
+                    x.value = value
+                if self._augs:
+                    self._pull_path(x)
+                return None
             y = x
-            if node.key < x.key:
+            if key < x.key:
                 x = x.left
             else:
                 x = x.right
 
-        node.parent = y
+        node = Node(
+            key=key,
+            color="RED",
+            parent=y,
+            left=self.NIL,
+            right=self.NIL,
+            size=1,
+            value=key if value is None else value,
+        )
         if y is None:
             self.root = node
-        elif node.key < y.key:
+        elif key < y.key:
             y.left = node
-        elif node.key > y.key:
-            y.right = node
-        else:  # Duplicates are allowed
+        else:
             y.right = node
+        return node
 
-    def _fix_insert(self, node: Node):
+    def _fix_insert(self, node: Node) -> bool:
+        stats = self.stats
         while node.parent and node.parent.color == "RED":
+            if stats is not None:
+                stats["fix_insert_iterations"] += 1
             if node.parent == node.parent.parent.left:
                 y = node.parent.parent.right
                 if y.color == "RED":
@@ -145,9 +426,15 @@ class RedBlackTree:
                     node.parent.parent.color = "RED"
                     self._left_rotate(node.parent.parent)
 
-        self.root.color = "BLACK"
+        # A red root turned black is the only way the black height grows
+        root = self.root
+        grew = root.color == "RED"
+        root.color = "BLACK"
+        return grew
 
     def _left_rotate(self, x: Node):
+        if self.stats is not None:
+            self.stats["rotations"] += 1
         y = x.right
         x.right = y.left
         if y.left != self.NIL:
@@ -164,7 +451,15 @@ class RedBlackTree:
         y.left = x
         x.parent = y
 
+        y.size = x.size
+        x.size = x.left.size + x.right.size + x.count
+        if self._augs:
+            self._pull(x)
+            self._pull(y)
+
     def _right_rotate(self, y: Node):
+        if self.stats is not None:
+            self.stats["rotations"] += 1
         x = y.left
         y.left = x.right
         if x.right != self.NIL:
@@ -181,31 +476,74 @@ class RedBlackTree:
         x.right = y
         y.parent = x
 
-    def delete(self, key: int):
-        node_to_delete = self.search(key, from_delete=True)
-        if node_to_delete is None:
-            print(f"Key {key} not found.")
+        x.size = y.size
+        y.size = y.left.size + y.right.size + y.count
+        if self._augs:
+            self._pull(y)
+            self._pull(x)
+
+    def delete(self, key: int, out=print):
+        if not self.remove(key):
+            out(f"Key {key} not found.")
             return
 
-        self._delete(node_to_delete)
-        print(f"Node with key {key} deleted successfully.")
+        out(f"Node with key {key} deleted successfully.")
+
+    def remove(self, key) -> bool:
+        # Removes one occurrence of key without printing anything
+        node = self._tree_search(self.root, key)
+        if node == self.NIL:
+            return False
+
+        stats = self.stats
+        if stats is not None:
+            stats["deletes"] += 1
+            rotations = stats["rotations"]
+
+        if node.count > 1 or self.lazy_delete is not None:
+            node.count -= 1
+            self._decrement_sizes(node, 1)
+            if self._augs:
+                self._pull_path(node)
+            if not node.count:
+                self.dead += 1
+                self.live -= 1
+                if self.dead > self.lazy_delete * (self.live + self.dead):
+                    self._relink_live()
+        else:
+            self._delete(node)
+        if stats is not None:
+            stats["delete_rotations"] += stats["rotations"] - rotations
+        return True
 
     def _delete(self, node: Node):
         y = node
         y_original_color = y.color
+        if node.left != self.NIL and node.right != self.NIL:
+            # The successor is unlinked from its spot and takes node's place
+            successor = self._tree_minimum(node.right)
+            self._decrement_sizes(successor.parent, successor.count, node)
+        self._decrement_sizes(node.parent, node.count)
+
+        # x takes the place of the removed node and x_parent is its parent.
+        # x may be the shared NIL sentinel, whose parent field is never
+        # written, so x_parent is tracked here instead of read from x.
         if node.left == self.NIL:
             x = node.right
+            x_parent = node.parent
             self._transplant(node, node.right)
         elif node.right == self.NIL:
             x = node.left
+            x_parent = node.parent
             self._transplant(node, node.left)
         else:
             y = self._tree_minimum(node.right)
             y_original_color = y.color
             x = y.right
             if y.parent == node:
-                x.parent = y
+                x_parent = y
             else:
+                x_parent = y.parent
                 self._transplant(y, y.right)
                 y.right = node.right
                 y.right.parent = y
@@ -214,9 +552,92 @@ class RedBlackTree:
             y.left = node.left
             y.left.parent = y
             y.color = node.color
+            y.size = y.left.size + y.right.size + y.count
 
+        if self._augs and x_parent is not None:
+            # x_parent is the lowest node whose subtree lost an element
+            self._pull_path(x_parent)
         if y_original_color == "BLACK":
-            self._fix_delete(x)
+            self._fix_delete(x, x_parent)
+
+    def _pull(self, node: Node):
+        # Recomputes node.aug from its own contribution and its children
+        left, right = node.left, node.right
+        aug = []
+        for i, augmentation in enumerate(self._augs):
+            value = augmentation.value(node)
+            if left is not NIL:
+                value = augmentation.combine(left.aug[i], value)
+            if right is not NIL:
+                value = augmentation.combine(value, right.aug[i])
+            aug.append(value)
+        node.aug = aug
+
+    def _pull_path(self, node: Node | None):
+        while node is not None:
+            self._pull(node)
+            node = node.parent
+
+    def aggregate(self, lo, hi, name: str):
+        # Folds augmentation `name` over the keys in [lo, hi] in O(log n):
+        # whole subtrees hanging inside the range contribute their stored
+        # aggregate, so only the two boundary paths are walked.
+        i, augmentation = self._find_augmentation(name)
+        x = self.root
+        while x != NIL and not lo <= x.key <= hi:
+            x = x.right if x.key < lo else x.left
+        if x == NIL:
+            return augmentation.identity
+
+        # x is the topmost node in range; its left subtree holds the lower
+        # boundary and its right subtree the upper one
+        result = self._fold_from(x.left, lo, i, augmentation)
+        result = augmentation.combine(result, augmentation.value(x))
+        return augmentation.combine(
+            result, self._fold_up_to(x.right, hi, i, augmentation)
+        )
+
+    def _find_augmentation(self, name: str) -> tuple[int, Augmentation]:
+        for i, augmentation in enumerate(self._augs):
+            if augmentation.name == name:
+                return i, augmentation
+        raise KeyError(f"aggregate: tree has no {name!r} augmentation")
+
+    def _fold_from(self, y: Node, lo, i: int, augmentation: Augmentation):
+        # Aggregate of the keys >= lo in the subtree at y. The nodes come
+        # out right to left, so each one is prepended.
+        combine = augmentation.combine
+        result = augmentation.identity
+        while y != NIL:
+            if y.key >= lo:
+                if y.right != NIL:
+                    result = combine(y.right.aug[i], result)
+                result = combine(augmentation.value(y), result)
+                y = y.left
+            else:
+                y = y.right
+        return result
+
+    def _fold_up_to(self, y: Node, hi, i: int, augmentation: Augmentation):
+        # Aggregate of the keys <= hi in the subtree at y, left to right
+        combine = augmentation.combine
+        result = augmentation.identity
+        while y != NIL:
+            if y.key <= hi:
+                if y.left != NIL:
+                    result = combine(result, y.left.aug[i])
+                result = combine(result, augmentation.value(y))
+                y = y.right
+            else:
+                y = y.left
+        return result
+
+    def _decrement_sizes(
+        self, node: Node | None, amount: int, stop: Node | None = None
+    ):
+        while node is not stop:
+            node.size -= amount
+            node = node.parent
 
     def _transplant(self, u: Node, v: Node):
         if u.parent is None:
@@ -226,194 +647,851 @@ class RedBlackTree:
         else:
             u.parent.right = v
 
-        v.parent = u.parent
+        if v != self.NIL:
+            v.parent = u.parent
 
-    def _fix_delete(self, x: Node):
+    def _fix_delete(self, x: Node, parent: Node | None):
+        # parent is x's parent, passed in because x may be NIL
+        stats = self.stats
         while x != self.root and x.color == "BLACK":
-            if x == x.parent.left:
-                w = x.parent.right
+            if stats is not None:
+                stats["fix_delete_iterations"] += 1
+            if x == parent.left:
+                w = parent.right
                 if w.color == "RED":
                     w.color = "BLACK"
-                    x.parent.color = "RED"
-                    self._left_rotate(x.parent)
-                    w = x.parent.right
+                    parent.color = "RED"
+                    self._left_rotate(parent)
+                    w = parent.right
 
                 if w.left.color == "BLACK" and w.right.color == "BLACK":
                     w.color = "RED"
-                    x = x.parent
+                    x = parent
+                    parent = x.parent
                 else:
                     if w.right.color == "BLACK":
                         w.left.color = "BLACK"
                         w.color = "RED"
                         self._right_rotate(w)
-                        w = x.parent.right
+                        w = parent.right
 
-                    w.color = x.parent.color
-                    x.parent.color = "BLACK"
+                    w.color = parent.color
+                    parent.color = "BLACK"
                     w.right.color = "BLACK"
-                    self._left_rotate(x.parent)
+                    self._left_rotate(parent)
                     x = self.root
             else:
-                w = x.parent.left
+                w = parent.left
                 if w.color == "RED":
                     w.color = "BLACK"
-                    x.parent.color = "RED"
-                    self._right_rotate(x.parent)
-                    w = x.parent.left
+                    parent.color = "RED"
+                    self._right_rotate(parent)
+                    w = parent.left
 
                 if w.right.color == "BLACK" and w.left.color == "BLACK":
                     w.color = "RED"
-                    x = x.parent
+                    x = parent
+                    parent = x.parent
                 else:
                     if w.left.color == "BLACK":
                         w.right.color = "BLACK"
                         w.color = "RED"
                         self._left_rotate(w)
-                        w = x.parent.left
+                        w = parent.left
 
-                    w.color = x.parent.color
-                    x.parent.color = "BLACK"
+                    w.color = parent.color
+                    parent.color = "BLACK"
                     w.left.color = "BLACK"
-                    self._right_rotate(x.parent)
+                    self._right_rotate(parent)
                     x = self.root
 
-        x.color = "BLACK"
+        if x != self.NIL:
+            x.color = "BLACK"
 
     def _tree_minimum(self, node: Node):
         while node.left != self.NIL:
             node = node.left
         return node
 
-    def search(self, key: int, from_delete=False):
-        node = self._search_recursive(self.root, key)
-        if node == self.NIL:
-            print(f"No node with key {key} found.")
-        elif not from_delete:
-            print(f"Node with key {key} found. Value: {node.key}")
+    def _tree_maximum(self, node: Node):
+        while node.right != self.NIL:
+            node = node.right
         return node
 
-    def _search_recursive(self, node: Node, key: int):
+    def search(self, key: int, from_delete=False, out=print):
+        node = self._tree_search(self.root, key)
         if node == self.NIL:
+            if not from_delete:
+                out(f"No node with key {key} found.")
             return None
-        if key == node.key:
-            return node
-        if key < node.key:
-            return self._search_recursive(node.left, key)
-        return self._search_recursive(node.right, key)
+        if not from_delete:
+            out(f"Node with key {key} found. Value: {node.value}")
+        return node
 
-    def rank(self, key):
+    def rank(self, key, out=print):
         node = self._tree_search(self.root, key)
         if node == self.NIL:
-            print(f"No node with key {key} found.")
+            out(f"No node with key {key} found.")
         else:
-            print(f"Rank of node with key {key}: {self._rank(node)}")
+            out(f"Rank of node with key {key}: {self._rank(node)}")
 
     def _rank(self, x: Node):
-        # r = x.left.size + 1
-        # y = x
-        # while y != self.root:
-        #     if y == y.parent.right:
-        #         r += y.parent.left.size + 1
-        #     y = y.parent
-        # return r
-        my_list = self.inorder_traversal()
-        return my_list.index(x.key) + 1
+        r = x.left.size + 1
+        y = x
+        while y != self.root:
+            if y == y.parent.right:
+                r += y.parent.left.size + y.parent.count
+            y = y.parent
+        return r
 
     def inorder_traversal(self):
-        result = []
-        self._inorder_traversal(self.root, result)
-        return result
-
-    def _inorder_traversal(self, node: Node, result: list):
-        if node != self.NIL:
-            self._inorder_traversal(node.left, result)
-            result.append(node.key)
-            self._inorder_traversal(node.right, result)
+        return list(self)
+
+    def __iter__(self):
+        # Keys in order, each repeated per occurrence. The walk follows
+        # parent pointers, so it needs O(1) memory and amortized O(1) time
+        # per node; the tree must not change while it runs.
+        x = self._first_node()
+        while x is not None:
+            for _ in range(x.count):
+                yield x.key
+            x = self._next_node(x)
+
+    def __reversed__(self):
+        x = self._last_node()
+        while x is not None:
+            for _ in range(x.count):
+                yield x.key
+            x = self._prev_node(x)
+
+    def cursor(self) -> "Cursor":
+        return Cursor(self)
+
+    def _first_node(self) -> Node | None:
+        # Leftmost live node, or None for an empty tree
+        if self.root == self.NIL:
+            return None
+        x = self._tree_minimum(self.root)
+        return x if x.count else self._next_node(x)
 
-    def select(self, r: int):
+    def _last_node(self) -> Node | None:
+        if self.root == self.NIL:
+            return None
+        x = self._tree_maximum(self.root)
+        return x if x.count else self._prev_node(x)
+
+    def _next_node(self, x: Node) -> Node | None:
+        # In-order successor of x, skipping tombstones; None past the end
+        while True:
+            if x.right != self.NIL:
+                x = self._tree_minimum(x.right)
+            else:
+                y = x.parent
+                while y is not None and x is y.right:
+                    x, y = y, y.parent
+                x = y
+            if x is None or x.count:
+                return x
+
+    def _prev_node(self, x: Node) -> Node | None:
+        while True:
+            if x.left != self.NIL:
+                x = self._tree_maximum(x.left)
+            else:
+                y = x.parent
+                while y is not None and x is y.left:
+                    x, y = y, y.parent
+                x = y
+            if x is None or x.count:
+                return x
+
+    def select(self, r: int, out=print):
         node = self._select(self.root, r)
         if node is None:
-            print(f"No node at rank {r} found.")
+            out(f"No node at rank {r} found.")
         else:
-            print(f"Key at rank {r}: {node}")
+            out(f"Key at rank {r}: {node.key}")
 
     def _select(self, x: Node, r: int):
-        # if x == self.NIL:
-        #     return None
-        # k = x.left.size + 1
-        # if r == k:
-        #     return x
-        # elif r < k:
-        #     return self._select(x.left, r)
-        # else:
-        #     return self._select(x.right, r - k)
-        my_list = self.inorder_traversal()
-        return my_list[r - 1]
-
-    def update(self, key: int, new_value: int):
+        if r < 1 or r > x.size:
+            return None
+        while x != self.NIL:
+            k = x.left.size
+            if r <= k:
+                x = x.left
+            elif r <= k + x.count:
+                return x
+            else:
+                r -= k + x.count
+                x = x.right
+        return None
+
+    def rank_many(self, keys) -> list[int | None]:
+        # Ranks for a batch of keys (None where a key is absent), in input
+        # order and without printing. The sorted queries are pushed down
+        # the tree together, each node splitting its slice of the batch, so
+        # shared path prefixes are walked once instead of once per query.
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        queries = [keys[i] for i in order]
+        ranks: list[int | None] = [None] * len(queries)
+        nil = self.NIL
+
+        stack = [(self.root, 0, len(queries), 0)]
+        while stack:
+            x, lo, hi, offset = stack.pop()
+            while x != nil:
+                i = bisect_left(queries, x.key, lo, hi)
+                j = bisect_right(queries, x.key, i, hi)
+                rank = offset + x.left.size + 1
+                if x.count:
+                    for q in range(i, j):
+                        ranks[order[q]] = rank
+                # Keep descending on one side, defer the other
+                if i > lo:
+                    if j < hi:
+                        stack.append((x.right, j, hi, rank - 1 + x.count))
+                    x, hi = x.left, i
+                elif j < hi:
+                    x, lo, offset = x.right, j, rank - 1 + x.count
+                else:
+                    break
+        return ranks
+
+    def select_many(self, ranks) -> list:
+        # Keys at a batch of 1-based ranks (None where out of range), in
+        # input order, answered in one shared descent like rank_many.
+        order = sorted(range(len(ranks)), key=ranks.__getitem__)
+        queries = [ranks[i] for i in order]
+        keys: list = [None] * len(queries)
+        nil = self.NIL
+
+        lo = bisect_left(queries, 1)
+        hi = bisect_right(queries, self.root.size)
+        stack = [(self.root, lo, hi, 0)]
+        while stack:
+            x, lo, hi, offset = stack.pop()
+            if hi - lo == 1:
+                # A lone query is cheaper as a plain descent
+                keys[order[lo]] = self._select(x, queries[lo] - offset).key
+                continue
+            while x != nil and lo < hi:
+                first = offset + x.left.size + 1
+                i = bisect_left(queries, first, lo, hi)
+                j = bisect_right(queries, first + x.count - 1, i, hi)
+                for q in range(i, j):
+                    keys[order[q]] = x.key
+                if i > lo:
+                    if j < hi:
+                        stack.append((x.right, j, hi, first - 1 + x.count))
+                    x, hi = x.left, i
+                else:
+                    x, lo, offset = x.right, j, first - 1 + x.count
+        return keys
+
+    def count_range(self, lo: int, hi: int) -> int:
+        # Number of keys k with lo <= k <= hi, in O(log n) from subtree sizes
+        if hi < lo:
+            return 0
+        return self._count_below(hi, inclusive=True) - self._count_below(lo)
+
+    def _count_below(self, key: int, inclusive: bool = False) -> int:
+        count = 0
+        x = self.root
+        while x != self.NIL:
+            if key < x.key or (key == x.key and not inclusive):
+                x = x.left
+            else:
+                count += x.left.size + x.count
+                x = x.right
+        return count
+
+    def iter_range(self, lo: int, hi: int):
+        # Yields the keys in [lo, hi] in order without building a list.
+        # Subtrees entirely below lo are never pushed, and the walk stops at
+        # the first key above hi, so a query costs O(log n + k).
+        stack = []
+        x = self.root
+        while stack or x != self.NIL:
+            if x != self.NIL:
+                if x.key < lo:
+                    x = x.right
+                else:
+                    stack.append(x)
+                    x = x.left
+            else:
+                x = stack.pop()
+                if x.key > hi:
+                    return
+                for _ in range(x.count):
+                    yield x.key
+                x = x.right
+
+    def get(self, key, default=None):
         node = self._tree_search(self.root, key)
         if node == self.NIL:
-            print(f"No node with key {key} found.")
+            return default
+        return node.value
+
+    def update(self, key: int, new_value: int, out=print):
+        # Values live on the node, so an update never restructures the tree
+        node = self._tree_search(self.root, key)
+        if node == self.NIL:
+            out(f"No node with key {key} found.")
         else:
             node.value = new_value
-            print(f"Node with key {key} updated to {new_value}.")
+            if self._augs:
+                self._pull_path(node)
+            out(f"Node with key {key} updated to {new_value}.")
+
+    def update_many(self, items) -> int:
+        # Applies (key, value) pairs sorted by key in a single top-down pass:
+        # each node takes the slice of the batch that falls in its subtree,
+        # so no node is visited twice. Missing keys are skipped; returns the
+        # number of pairs applied.
+        items = list(items)
+        keys = [key for key, _ in items]
+        for i in range(1, len(keys)):
+            if keys[i] < keys[i - 1]:
+                raise ValueError("update_many: keys are not sorted")
+
+        updated = 0
+        stack = [(self.root, 0, len(keys))]
+        while stack:
+            x, lo, hi = stack.pop()
+            if lo >= hi or x == self.NIL:
+                continue
+            i = bisect_left(keys, x.key, lo, hi)
+            j = i
+            while j < hi and keys[j] == x.key:
+                j += 1
+            if j > i and x.count:
+                x.value = items[j - 1][1]
+                if self._augs:
+                    self._pull_path(x)
+                updated += j - i
+            stack.append((x.left, lo, i))
+            stack.append((x.right, j, hi))
+        return updated
 
     def _tree_search(self, x: Node, key: int):
+        if self.stats is not None:
+            return self._counted_tree_search(x, key)
         while x != self.NIL and key != x.key:
             if key < x.key:
                 x = x.left
             else:
                 x = x.right
-        return x
+        # Tombstones (and NIL) have count 0 and are reported as missing
+        return x if x.count else self.NIL
 
-    def rebalance(self):
-        print("Tree rebalanced successfully.")
+    def _counted_tree_search(self, x: Node, key: int):
+        stats = self.stats
+        stats["searches"] += 1
+        while x != self.NIL:
+            stats["search_comparisons"] += 1
+            if key == x.key:
+                break
+            if key < x.key:
+                x = x.left
+            else:
+                x = x.right
+        return x if x.count else self.NIL
+
+    def rebalance(self, out=print):
+        # Relinks the existing nodes into a minimum-height tree in O(n),
+        # recomputing colours and sizes, so searches after heavy delete
+        # churn no longer pay for the 2 * log n red-black height slack.
+        # Tombstones are dropped on the way.
+        self._relink_live()
+        out("Tree rebalanced successfully.")
+
+    def _inorder_nodes(self) -> list[Node]:
+        # Live nodes in key order; tombstones are skipped
+        nodes = []
+        stack = []
+        x = self.root
+        while stack or x != self.NIL:
+            if x != self.NIL:
+                stack.append(x)
+                x = x.left
+            else:
+                x = stack.pop()
+                if x.count:
+                    nodes.append(x)
+                x = x.right
+        return nodes
+
+    @classmethod
+    def join(cls, left, key, right, value=None) -> "RedBlackTree":
+        # Joins two trees around a new key with max(left) < key < min(right)
+        # in O(log n). Both input trees are emptied. Pending tombstones are
+        # compacted first (O(n) once), since the result has lazy deletion
+        # off.
+        left.compact()
+        right.compact()
+        if left.root != NIL and not left._tree_maximum(left.root).key < key:
+            raise ValueError("join: left tree has keys >= key")
+        if right.root != NIL and not key < right._tree_minimum(right.root).key:
+            raise ValueError("join: right tree has keys <= key")
+
+        node = Node(
+            key=key,
+            color="RED",
+            parent=None,
+            left=NIL,
+            right=NIL,
+            size=1,
+            value=key if value is None else value,
+        )
+        tree = cls(left._augs)
+        tree._join_nodes(
+            left.root,
+            tree._black_height(left.root),
+            node,
+            right.root,
+            tree._black_height(right.root),
+        )
+        left.root = right.root = NIL
+        return tree
+
+    @classmethod
+    def concat(cls, left, right) -> "RedBlackTree":
+        # Joins two trees with max(left) < min(right) in O(log n). Both
+        # inputs are emptied; pending tombstones are compacted first, as
+        # in join.
+        left.compact()
+        right.compact()
+        if left.root != NIL and right.root != NIL:
+            left_max = left._tree_maximum(left.root).key
+            if not left_max < right._tree_minimum(right.root).key:
+                raise ValueError("concat: trees overlap")
+        tree = cls(left._augs)
+        tree._concat_nodes(left.root, right.root)
+        left.root = right.root = NIL
+        return tree
+
+    def split(self, key) -> tuple["RedBlackTree", "RedBlackTree"]:
+        # Splits into (keys < key, keys >= key) in O(log n); self is emptied.
+        # Pending tombstones are compacted first (O(n) once), so the halves
+        # have none.
+        self.compact()
+        height = self._black_height(self.root)
+        left_root, _, right_root, _ = self._split_nodes(
+            self.root, height, key, False
+        )
+        self.root = NIL
+        left = type(self)(self._augs)
+        left.root = left_root
+        right = type(self)(self._augs)
+        right.root = right_root
+        return left, right
+
+    def delete_range(self, lo, hi) -> int:
+        # Removes every occurrence of the keys in [lo, hi] and returns how
+        # many there were. Two splits cut the range out as a single subtree,
+        # which is dropped whole, and the two outer parts are concatenated
+        # again, so the cost is O(log n) whatever the size of the range.
+        # Tombstones are size-0 nodes that the splits and joins carry like
+        # any other; with lazy deletion on, the dropped subtree is walked
+        # once to keep the node counters, adding O(k) for k removed nodes.
+        if hi < lo or self.root == NIL:
+            return 0
+        height = self._black_height(self.root)
+        lower, _, rest, rest_height = self._split_nodes(
+            self.root, height, lo, False
+        )
+        middle, _, upper, _ = self._split_nodes(rest, rest_height, hi, True)
+        self._concat_nodes(lower, upper)
+        if self.lazy_delete is not None:
+            nodes, dead = self._node_counts(middle)
+            self.dead -= dead
+            self.live -= nodes - dead
+        return middle.size
+
+    def _node_counts(self, t: Node) -> tuple[int, int]:
+        # (nodes, tombstones) in the subtree at t
+        nodes = dead = 0
+        stack = [t]
+        while stack:
+            x = stack.pop()
+            if x != NIL:
+                nodes += 1
+                if not x.count:
+                    dead += 1
+                stack.append(x.left)
+                stack.append(x.right)
+        return nodes, dead
+
+    def _concat_nodes(self, left: Node, right: Node) -> Node:
+        # Links the subtree roots left and right, max(left) < min(right),
+        # and makes the result self.root. The maximum node of left is
+        # unlinked and becomes the joining node.
+        if left == NIL:
+            self.root = right
+            return right
+        self.root = left
+        node = self._tree_maximum(left)
+        self._delete(node)
+        node.left = node.right = NIL
+        node.parent = None
+        left_height = self._black_height(self.root)
+        right_height = self._black_height(right)
+        return self._join_nodes(
+            self.root, left_height, node, right, right_height
+        )[0]
+
+    def _split_nodes(self, t: Node, height: int, key, inclusive: bool):
+        # Returns (lower, lower height, upper, upper height): the roots and
+        # black heights of (keys < key, keys >= key), or of (keys <= key,
+        # keys > key) when inclusive. height is the black height of t. Each
+        # level joins the detached node with the subtree on its side; the
+        # children's heights follow from t's, and the joins along the path
+        # add up to O(log n) as their height differences telescope.
+        if t == NIL:
+            return NIL, 0, NIL, 0
+        left, right = t.left, t.right
+        child_height = height - (t.color == "BLACK")
+        t.left = t.right = NIL
+        t.parent = None
+        if key < t.key or (key == t.key and not inclusive):
+            lower, lower_height, upper, upper_height = self._split_nodes(
+                left, child_height, key, inclusive
+            )
+            upper, upper_height = self._join_nodes(
+                upper, upper_height, t, right, child_height
+            )
+        else:
+            lower, lower_height, upper, upper_height = self._split_nodes(
+                right, child_height, key, inclusive
+            )
+            lower, lower_height = self._join_nodes(
+                left, child_height, t, lower, lower_height
+            )
+        return lower, lower_height, upper, upper_height
+
+    def _join_nodes(
+        self,
+        left: Node,
+        left_height: int,
+        x: Node,
+        right: Node,
+        right_height: int,
+    ) -> tuple[Node, int]:
+        # Links the subtree roots left and right under the detached node x,
+        # where every key of left < x.key < every key of right, and makes
+        # the result self.root. Takes the black heights of left and right
+        # and returns the root with its black height, so nothing is
+        # measured here. x is hung at the spine of the taller side at the
+        # black height of the shorter one and fixed like an insert, which
+        # costs O(|left_height - right_height| + 1).
+        left_height = self._detach_root(left, left_height)
+        right_height = self._detach_root(right, right_height)
+
+        if left_height == right_height:
+            self._link_children(x, left, right)
+            x.parent = None
+            x.color = "BLACK"
+            if self._augs:
+                self._pull(x)
+            self.root = x
+            return x, left_height + 1
 
+        if left_height > right_height:
+            parent, y = self._spine_node(left, left_height, right_height, True)
+            parent.right = x
+            self._link_children(x, y, right)
+            self.root = left
+        else:
+            parent, y = self._spine_node(right, right_height, left_height, False)
+            parent.left = x
+            self._link_children(x, left, y)
+            self.root = right
+        x.parent = parent
+        x.color = "RED"
+
+        added = x.size - y.size
+        a = parent
+        while a is not None:
+            a.size += added
+            a = a.parent
+        if self._augs:
+            self._pull_path(x)
+        grew = self._fix_insert(x)
+        return self.root, max(left_height, right_height) + grew
+
+    def _detach_root(self, node: Node, height: int) -> int:
+        # Makes node a black parentless root; returns its new black height
+        if node == NIL:
+            return 0
+        node.parent = None
+        if node.color == "RED":
+            node.color = "BLACK"
+            return height + 1
+        return height
+
+    def _spine_node(self, y: Node, height: int, target: int, rightward: bool):
+        # Follows the right (or left) spine down from y, whose black height
+        # is height, to the first black node of black height target.
+        # Returns that node and its parent.
+        parent = None
+        while y.color == "RED" or height != target:
+            if y.color == "BLACK":
+                height -= 1
+            parent, y = y, (y.right if rightward else y.left)
+        return parent, y
+
+    def _link_children(self, x: Node, left: Node, right: Node):
+        x.left, x.right = left, right
+        if left != NIL:
+            left.parent = x
+        if right != NIL:
+            right.parent = x
+        x.size = left.size + right.size + x.count
+
+    def _black_height(self, node: Node) -> int:
+        height = 0
+        while node != NIL:
+            if node.color == "BLACK":
+                height += 1
+            node = node.left
+        return height
+
+    def dump(self, path: str):
+        # Binary snapshot: a header followed by the in-order keys, their
+        # multiplicities and (unless every value is its key) their values,
+        # each as a native-endian array("q") written with tofile. Colours
+        # and sizes are not stored: load rebuilds the minimum-height tree,
+        # whose colours and sizes follow from the in-order columns alone.
+        # Every column is converted before the file is opened, so a tree
+        # that cannot be dumped leaves no partial file behind.
+        nodes = self._inorder_nodes()
+        keys = _int64_column([node.key for node in nodes], "keys")
+        counts = _int64_column([node.count for node in nodes], "counts")
+        flags = 0
+        values = None
+        if any(node.value != node.key for node in nodes):
+            flags |= DUMP_HAS_VALUES
+            values = _int64_column([node.value for node in nodes], "values")
+
+        with open(path, "wb") as f:
+            f.write(DUMP_HEADER.pack(DUMP_MAGIC, flags, len(nodes)))
+            keys.tofile(f)
+            counts.tofile(f)
+            if values is not None:
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "RedBlackTree":
+        # Reads a dump() file through mmap and relinks it in O(n), without
+        # any per-key descent or rebalancing.
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < DUMP_HEADER.size:
+                raise ValueError(f"{path}: not a DOSTree dump")
+            if file_size == DUMP_HEADER.size:
+                magic, flags, n = DUMP_HEADER.unpack(f.read())
+                if magic != DUMP_MAGIC or n:
+                    raise ValueError(f"{path}: not a DOSTree dump")
+                return cls()
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, flags, n = DUMP_HEADER.unpack_from(mm)
+                end = DUMP_HEADER.size + 8 * n * (
+                    3 if flags & DUMP_HAS_VALUES else 2
+                )
+                if magic != DUMP_MAGIC or len(mm) != end:
+                    raise ValueError(f"{path}: not a DOSTree dump")
+
+                with memoryview(mm) as view:
+                    start = DUMP_HEADER.size
+                    keys = view[start : start + 8 * n].cast("q")
+                    counts = view[start + 8 * n : start + 16 * n].cast("q")
+                    values = view[start + 16 * n :].cast("q")
+                    if not flags & DUMP_HAS_VALUES:
+                        values = keys
+                    tree = cls.from_sorted_runs(keys, counts, values)
+                    keys.release()
+                    counts.release()
+                    values.release()
+
+        return tree
+
+
+class Cursor:
+    # A position at one occurrence of a key in a RedBlackTree (a key with
+    # count 3 has three positions), or nowhere. Positioning costs O(log n)
+    # and next()/prev() amortized O(1), following parent pointers without
+    # a stack, so paging through any tree takes constant memory. Every
+    # method returns the key at the new position, or None when there is
+    # none. Updating the tree invalidates its cursors.
+    def __init__(self, tree: RedBlackTree):
+        self.tree = tree
+        self.node: Node | None = None
+        # Which occurrence of node.key the cursor is at, from 0
+        self.offset = 0
+
+    @property
+    def key(self):
+        return None if self.node is None else self.node.key
+
+    @property
+    def value(self):
+        return None if self.node is None else self.node.value
+
+    def _at(self, node: Node | None, offset: int = 0):
+        self.node = node
+        self.offset = offset
+        return None if node is None else node.key
+
+    def seek(self, key):
+        # First occurrence of key
+        node = self.tree._tree_search(self.tree.root, key)
+        return self._at(None if node == NIL else node)
+
+    def seek_rank(self, r: int):
+        # Occurrence at 1-based rank r
+        x = self.tree.root
+        if r < 1 or r > x.size:
+            return self._at(None)
+        while True:
+            k = x.left.size
+            if r <= k:
+                x = x.left
+            elif r <= k + x.count:
+                return self._at(x, r - k - 1)
+            else:
+                r -= k + x.count
+                x = x.right
 
-# Main function to handle input commands
-def main():
-    rb_tree = RedBlackTree()
+    def ceiling(self, key):
+        # First occurrence of the smallest key >= key
+        best = None
+        x = self.tree.root
+        while x != NIL:
+            if x.key < key:
+                x = x.right
+            else:
+                best, x = x, x.left
+        if best is not None and not best.count:
+            best = self.tree._next_node(best)
+        return self._at(best)
+
+    def floor(self, key):
+        # Last occurrence of the largest key <= key
+        best = None
+        x = self.tree.root
+        while x != NIL:
+            if x.key > key:
+                x = x.left
+            else:
+                best, x = x, x.right
+        if best is not None and not best.count:
+            best = self.tree._prev_node(best)
+        return self._at(best, 0 if best is None else best.count - 1)
+
+    def next(self):
+        node = self.node
+        if node is None:
+            return None
+        if self.offset + 1 < node.count:
+            self.offset += 1
+            return node.key
+        return self._at(self.tree._next_node(node))
+
+    def prev(self):
+        node = self.node
+        if node is None:
+            return None
+        if self.offset:
+            self.offset -= 1
+            return node.key
+        node = self.tree._prev_node(node)
+        return self._at(node, 0 if node is None else node.count - 1)
+
+
+# Command handlers, dispatched by the first word of each input line.
+# Every handler gets the tree, the split command line and an `out` callable
+# that collects the messages instead of printing them one by one.
+def _insert_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.insert(int(command_line[1]))
 
-    while True:
-        try:
-            command_line = input().split()
-            command = command_line[0]
 
-            if command == "insert":
-                key = int(command_line[1])
+def _delete_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.delete(int(command_line[1]), out=out)
 
-                rb_tree.insert(key)
-                # print(f"Node with key {key} inserted successfully.")
 
-            elif command == "delete":
-                key = int(command_line[1])
-                # print("KEY", key)
-                rb_tree.delete(key)
+def _find_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.search(int(command_line[1]), out=out)
 
-            elif command == "find":
-                key = int(command_line[1])
-                rb_tree.search(key)
 
-            elif command == "rank":
-                key = int(command_line[1])
-                rb_tree.rank(key)
+def _rank_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.rank(int(command_line[1]), out=out)
 
-            elif command == "select":
-                r = int(command_line[1])
-                rb_tree.select(r)
 
-            elif command == "rebalance":
-                rb_tree.rebalance()
+def _select_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.select(int(command_line[1]), out=out)
 
-            elif command == "update":
-                key = int(command_line[1])
-                new_value = int(command_line[2])
-                rb_tree.update(key, new_value)
 
-        except EOFError:
+def _rebalance_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.rebalance(out=out)
+
+
+def _delete_range_command(rb_tree: RedBlackTree, command_line: list, out):
+    lo, hi = int(command_line[1]), int(command_line[2])
+    removed = rb_tree.delete_range(lo, hi)
+    out(f"Deleted {removed} keys in range [{lo}, {hi}].")
+
+
+def _update_command(rb_tree: RedBlackTree, command_line: list, out):
+    rb_tree.update(int(command_line[1]), int(command_line[2]), out=out)
+
+
+COMMANDS = {
+    b"insert": _insert_command,
+    b"delete": _delete_command,
+    b"delete_range": _delete_range_command,
+    b"find": _find_command,
+    b"rank": _rank_command,
+    b"select": _select_command,
+    b"rebalance": _rebalance_command,
+    b"update": _update_command,
+}
+
+# Bytes of input read per batch; output is written once per batch.
+CHUNK_SIZE = 1 << 20
+
+
+def run_commands(rb_tree: RedBlackTree, lines: list[bytes], out):
+    commands = COMMANDS
+    for line in lines:
+        command_line = line.split()
+        if not command_line:
+            continue
+        handler = commands.get(command_line[0])
+        if handler is not None:
+            handler(rb_tree, command_line, out)
+
+
+# Main function to handle input commands
+def main():
+    rb_tree = RedBlackTree()
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout
+
+    results: list[str] = []
+    while True:
+        lines = stdin.readlines(CHUNK_SIZE)
+        if not lines:
             # Handle EOF (end of input) gracefully
             break
 
+        run_commands(rb_tree, lines, results.append)
+        if results:
+            results.append("")
+            stdout.write("\n".join(results))
+            stdout.flush()
+            results.clear()
+
 
 if __name__ == "__main__":
     main()
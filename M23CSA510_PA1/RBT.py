@@ -14,6 +14,20 @@ class Node:
         self.right = right
 
 
+# Counters kept by RedBlackTree.enable_stats()
+STAT_COUNTERS = (
+    "inserts",
+    "deletes",
+    "searches",
+    "rotations",
+    "insert_rotations",
+    "delete_rotations",
+    "fix_insert_iterations",
+    "fix_delete_iterations",
+    "search_comparisons",
+)
+
+
 class RedBlackTree:
     def __init__(self):
         self.NIL = Node(
@@ -24,14 +38,70 @@ class RedBlackTree:
             right=None,
         )
         self.root = self.NIL
+        # Operation counters, None unless enable_stats() was called
+        self.stats: dict[str, int] | None = None
+
+    def enable_stats(self):
+        self.stats = dict.fromkeys(STAT_COUNTERS, 0)
+
+    def disable_stats(self):
+        self.stats = None
+
+    def get_stats(self, height: bool = False) -> dict:
+        # The counters, rotations and fix-up iterations per operation,
+        # comparisons per search and the black height; the exact height
+        # needs an O(n) walk, so it is only added with height=True
+        if self.stats is None:
+            return {}
+        stats = dict(self.stats)
+        inserts = stats["inserts"] or 1
+        deletes = stats["deletes"] or 1
+        stats["rotations_per_insert"] = stats["insert_rotations"] / inserts
+        stats["rotations_per_delete"] = stats["delete_rotations"] / deletes
+        stats["fix_insert_iterations_per_insert"] = (
+            stats["fix_insert_iterations"] / inserts
+        )
+        stats["fix_delete_iterations_per_delete"] = (
+            stats["fix_delete_iterations"] / deletes
+        )
+        stats["comparisons_per_search"] = stats["search_comparisons"] / (
+            stats["searches"] or 1
+        )
+        node = self.root
+        stats["black_height"] = 0
+        while node != self.NIL:
+            stats["black_height"] += node.color == "BLACK"
+            node = node.left
+        if height:
+            stats["height"] = self.height()
+        return stats
+
+    def height(self) -> int:
+        # Nodes on the longest root-to-leaf path, found without recursion
+        height = 0
+        stack = [(self.root, 1)]
+        while stack:
+            node, depth = stack.pop()
+            if node != self.NIL:
+                if depth > height:
+                    height = depth
+                stack.append((node.left, depth + 1))
+                stack.append((node.right, depth + 1))
+        return height
 
     def insert(self, key):
+        stats = self.stats
+        if stats is not None:
+            stats["inserts"] += 1
+            rotations = stats["rotations"]
         new_node = Node(
             key=key, color="RED", parent=None, left=self.NIL, right=self.NIL
         )
         # print("NN --> ", new_node.__dict__)
         self._insert(new_node)
         self._fix_insert(new_node)
+        if stats is not None:
+            stats["insert_rotations"] += stats["rotations"] - rotations
 
     def _insert(self, node: Node):
         y = None
@@ -55,7 +125,10 @@ class RedBlackTree:
             y.right = node
 
     def _fix_insert(self, node: Node):
+        stats = self.stats
         while node.parent and node.parent.color == "RED":
+            if stats is not None:
+                stats["fix_insert_iterations"] += 1
             if node.parent == node.parent.parent.left:
                 y = node.parent.parent.right
                 if y.color == "RED":
@@ -88,6 +161,8 @@ class RedBlackTree:
         self.root.color = "BLACK"
 
     def _left_rotate(self, x: Node):
+        if self.stats is not None:
+            self.stats["rotations"] += 1
         y = x.right
         x.right = y.left
         if y.left != self.NIL:
@@ -105,6 +180,8 @@ class RedBlackTree:
         x.parent = y
 
     def _right_rotate(self, y: Node):
+        if self.stats is not None:
+            self.stats["rotations"] += 1
         x = y.left
         y.left = x.right
         if x.right != self.NIL:
@@ -127,7 +204,13 @@ class RedBlackTree:
             # print(f"Key {key} not found.")
             return
 
+        stats = self.stats
+        if stats is not None:
+            stats["deletes"] += 1
+            rotations = stats["rotations"]
         self._delete(node_to_delete)
+        if stats is not None:
+            stats["delete_rotations"] += stats["rotations"] - rotations
 
     def _delete(self, node: Node):
         y = node
@@ -168,7 +251,10 @@ class RedBlackTree:
         v.parent = u.parent
 
     def _fix_delete(self, x: Node):
+        stats = self.stats
         while x != self.root and x.color == "BLACK":
+            if stats is not None:
+                stats["fix_delete_iterations"] += 1
             if x == x.parent.left:
                 w = x.parent.right
                 if w.color == "RED":
@@ -223,9 +309,58 @@ class RedBlackTree:
             node = node.left
         return node
 
+    def _tree_maximum(self, node: Node):
+        while node.right != self.NIL:
+            node = node.right
+        return node
+
+    def __iter__(self):
+        # Keys in order without building a list: each step moves to the
+        # in-order successor along parent pointers, so the walk needs O(1)
+        # memory. The tree must not change while it runs.
+        if self.root == self.NIL:
+            return
+        node = self._tree_minimum(self.root)
+        while node is not None:
+            yield node.key
+            if node.right != self.NIL:
+                node = self._tree_minimum(node.right)
+            else:
+                parent = node.parent
+                while parent is not None and node is parent.right:
+                    node, parent = parent, parent.parent
+                node = parent
+
+    def __reversed__(self):
+        if self.root == self.NIL:
+            return
+        node = self._tree_maximum(self.root)
+        while node is not None:
+            yield node.key
+            if node.left != self.NIL:
+                node = self._tree_maximum(node.left)
+            else:
+                parent = node.parent
+                while parent is not None and node is parent.left:
+                    node, parent = parent, parent.parent
+                node = parent
+
     def search(self, key: int):
+        if self.stats is not None:
+            return self._counted_search(key)
         return self._search_recursive(self.root, key)
 
+    def _counted_search(self, key: int):
+        stats = self.stats
+        stats["searches"] += 1
+        node = self.root
+        while node != self.NIL:
+            stats["search_comparisons"] += 1
+            if key == node.key:
+                return node
+            node = node.left if key < node.key else node.right
+        return None
+
     def _search_recursive(self, node: Node, key: int):
         if node == self.NIL:
             return None
@@ -1,3 +1,8 @@
+# An AVL tree of height h has at least Fib(h + 2) - 1 nodes, so no tree
+# that fits in memory has a root-to-leaf path longer than this.
+MAX_HEIGHT = 64
+
+
 class AVLNode:
     def __init__(self, key):
         self.key = key
@@ -9,6 +14,8 @@ class AVLNode:
 class AVLTree:
     def __init__(self):
         self.root = None
+        # Preallocated stack of the nodes on the current insert/delete path
+        self._path = [None] * MAX_HEIGHT
 
     def height(self, node):
         if node is None:
@@ -93,7 +100,53 @@ class AVLTree:
         return self.balance_node(root)
 
     def insert_key(self, key):
-        self.root = self.insert(self.root, key)
+        # Iterative version of insert(): the descent is recorded on the
+        # path stack, then rebalanced bottom-up without a frame per level.
+        node = self.root
+        if node is None:
+            self.root = AVLNode(key)
+            return
+
+        path = self._path
+        depth = 0
+        while True:
+            path[depth] = node
+            depth += 1
+            if key < node.key:
+                if node.left is None:
+                    node.left = AVLNode(key)
+                    break
+                node = node.left
+            elif key > node.key:
+                if node.right is None:
+                    node.right = AVLNode(key)
+                    break
+                node = node.right
+            else:
+                # Duplicate keys are not allowed
+                return
+
+        self._rebalance_path(depth)
+
+    def _rebalance_path(self, depth):
+        # Rebalances path[depth - 1] up to the root. Heights and balance
+        # factors depend only on the child heights, so the walk stops at
+        # the first subtree whose height came out unchanged, and a parent
+        # link is only rewritten when a rotation replaced the subtree root.
+        path = self._path
+        for i in range(depth - 1, -1, -1):
+            node = path[i]
+            old_height = node.height
+            subtree = self.balance_node(node)
+            if subtree is not node:
+                if i == 0:
+                    self.root = subtree
+                elif path[i - 1].left is node:
+                    path[i - 1].left = subtree
+                else:
+                    path[i - 1].right = subtree
+            if subtree.height == old_height:
+                break
 
     def delete(self, root, key):
         if root is None:
@@ -122,7 +175,38 @@ class AVLTree:
         return self.balance_node(root)
 
     def delete_key(self, key):
-        self.root = self.delete(self.root, key)
+        # Iterative version of delete(), rebalanced like insert_key()
+        path = self._path
+        depth = 0
+        node = self.root
+        while node is not None and key != node.key:
+            path[depth] = node
+            depth += 1
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return
+
+        if node.left is not None and node.right is not None:
+            # Node with two children: it takes the inorder successor's key
+            # and the successor, which has no left child, is removed instead
+            path[depth] = node
+            depth += 1
+            successor = node.right
+            while successor.left is not None:
+                path[depth] = successor
+                depth += 1
+                successor = successor.left
+            node.key = successor.key
+            node = successor
+
+        child = node.left if node.left is not None else node.right
+        if depth == 0:
+            self.root = child
+        elif path[depth - 1].left is node:
+            path[depth - 1].left = child
+        else:
+            path[depth - 1].right = child
+        self._rebalance_path(depth)
 
     def get_min_value_node(self, root):
         current = root
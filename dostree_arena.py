@@ -0,0 +1,471 @@
+"""
+Array-backed (arena) variant of the DOSTree red-black tree.
+
+Nodes are integer indices into parallel arrays instead of Python objects:
+keys, links and subtree sizes live in array("q") columns and colours in a
+bytearray, so a node costs ~41 bytes instead of a full object with a
+__dict__. Index 0 is the shared NIL sentinel and deleted slots are chained
+into a free list (through the left column) and reused by later inserts.
+
+The public API mirrors DOSTree.RedBlackTree: insert, delete, search (find),
+rank, select and inorder_traversal. from_sorted builds the minimum-height
+tree over sorted keys without any descents; its links depend only on the
+number of keys, so balanced_links can compute them slice by slice (see
+dostree_parallel).
+
+Run this module directly to compare memory per key against the object based
+tree, e.g. `python dostree_arena.py 1000000 10000000`.
+"""
+
+import sys
+import tracemalloc
+from array import array
+
+NIL = 0
+BLACK = 0
+RED = 1
+
+
+def balanced_links(n: int, start: int, stop: int):
+    # The left, parent, right, size and colour columns of the minimum-height
+    # tree over n sorted keys held in slots 1..n in key order, for the keys
+    # at positions start..stop - 1 (slots start + 1..stop) only. Every node
+    # is the middle of its range, so its links follow from n and its
+    # position alone, and any slice can be computed on its own in
+    # O(stop - start + log n). As in DOSTree's _link_balanced, the deepest
+    # level is red and the rest black.
+    count = stop - start
+    left = array("q", bytes(8 * count))
+    right = array("q", bytes(8 * count))
+    parent = array("q", bytes(8 * count))
+    size = array("q", bytes(8 * count))
+    color = bytearray(count)
+    red_depth = n.bit_length() - 1
+    # (lo, hi, depth, parent slot) of the ranges that overlap the slice
+    stack = [(0, n, 0, NIL)] if start < stop else []
+    while stack:
+        lo, hi, depth, up = stack.pop()
+        mid = (lo + hi) // 2
+        if start <= mid < stop:
+            i = mid - start
+            left[i] = (lo + mid) // 2 + 1 if lo < mid else NIL
+            right[i] = (mid + 1 + hi) // 2 + 1 if mid + 1 < hi else NIL
+            parent[i] = up
+            size[i] = hi - lo
+            color[i] = RED if depth == red_depth else BLACK
+        if lo < mid and lo < stop and start < mid:
+            stack.append((lo, mid, depth + 1, mid + 1))
+        if mid + 1 < hi and mid + 1 < stop and start < hi:
+            stack.append((mid + 1, hi, depth + 1, mid + 1))
+    return left, right, parent, size, color
+
+
+class ArenaRedBlackTree:
+    def __init__(self):
+        # Slot 0 is the NIL sentinel: black, size 0, links pointing to itself
+        self.key = array("q", [0])
+        self.left = array("q", [NIL])
+        self.right = array("q", [NIL])
+        self.parent = array("q", [NIL])
+        self.size = array("q", [0])
+        self.color = bytearray([BLACK])
+        self.root = NIL
+        self._free = NIL
+
+    def __len__(self):
+        return self.size[self.root]
+
+    @classmethod
+    def from_sorted(cls, keys, links=None) -> "ArenaRedBlackTree":
+        # O(n) build from keys in ascending order. links, if given, are the
+        # columns of balanced_links(len(keys), 0, len(keys)), e.g. put
+        # together from slices computed elsewhere.
+        n = len(keys)
+        if links is None:
+            links = balanced_links(n, 0, n)
+        tree = cls()
+        tree.key.extend(keys)
+        for column, values in zip(
+            (tree.left, tree.right, tree.parent, tree.size, tree.color), links
+        ):
+            column.extend(values)
+        if n:
+            tree.root = n // 2 + 1
+            tree.color[tree.root] = BLACK
+        return tree
+
+    def _new_node(self, key: int) -> int:
+        node = self._free
+        if node != NIL:
+            self._free = self.left[node]
+            self.key[node] = key
+            self.left[node] = NIL
+            self.right[node] = NIL
+            self.parent[node] = NIL
+            self.size[node] = 1
+            self.color[node] = RED
+        else:
+            node = len(self.key)
+            self.key.append(key)
+            self.left.append(NIL)
+            self.right.append(NIL)
+            self.parent.append(NIL)
+            self.size.append(1)
+            self.color.append(RED)
+        return node
+
+    def _free_node(self, node: int):
+        self.left[node] = self._free
+        self._free = node
+
+    def insert(self, key: int):
+        keys, left, right, size = self.key, self.left, self.right, self.size
+        node = self._new_node(key)
+
+        y = NIL
+        x = self.root
+        while x != NIL:
+            y = x
+            size[x] += 1
+            if key < keys[x]:
+                x = left[x]
+            else:
+                x = right[x]
+
+        self.parent[node] = y
+        if y == NIL:
+            self.root = node
+        elif key < keys[y]:
+            left[y] = node
+        else:  # Duplicates are allowed
+            right[y] = node
+
+        self._fix_insert(node)
+
+    def _fix_insert(self, node: int):
+        left, parent, color = self.left, self.parent, self.color
+        while color[parent[node]] == RED:
+            p = parent[node]
+            g = parent[p]
+            if p == left[g]:
+                y = self.right[g]
+                if color[y] == RED:
+                    color[p] = BLACK
+                    color[y] = BLACK
+                    color[g] = RED
+                    node = g
+                else:
+                    if node == self.right[p]:
+                        node = p
+                        self._left_rotate(node)
+                        p = parent[node]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self._right_rotate(g)
+            else:
+                y = left[g]
+                if color[y] == RED:
+                    color[p] = BLACK
+                    color[y] = BLACK
+                    color[g] = RED
+                    node = g
+                else:
+                    if node == left[p]:
+                        node = p
+                        self._right_rotate(node)
+                        p = parent[node]
+                    color[p] = BLACK
+                    color[g] = RED
+                    self._left_rotate(g)
+
+        color[self.root] = BLACK
+
+    def _left_rotate(self, x: int):
+        left, right, parent, size = self.left, self.right, self.parent, self.size
+        y = right[x]
+        right[x] = left[y]
+        if left[y] != NIL:
+            parent[left[y]] = x
+
+        px = parent[x]
+        parent[y] = px
+        if px == NIL:
+            self.root = y
+        elif x == left[px]:
+            left[px] = y
+        else:
+            right[px] = y
+
+        left[y] = x
+        parent[x] = y
+
+        size[y] = size[x]
+        size[x] = size[left[x]] + size[right[x]] + 1
+
+    def _right_rotate(self, y: int):
+        left, right, parent, size = self.left, self.right, self.parent, self.size
+        x = left[y]
+        left[y] = right[x]
+        if right[x] != NIL:
+            parent[right[x]] = y
+
+        py = parent[y]
+        parent[x] = py
+        if py == NIL:
+            self.root = x
+        elif y == left[py]:
+            left[py] = x
+        else:
+            right[py] = x
+
+        right[x] = y
+        parent[y] = x
+
+        size[x] = size[y]
+        size[y] = size[left[y]] + size[right[y]] + 1
+
+    def delete(self, key: int, out=print):
+        node = self._tree_search(key)
+        if node == NIL:
+            out(f"Key {key} not found.")
+            return
+
+        self._delete(node)
+        out(f"Node with key {key} deleted successfully.")
+
+    def _delete(self, node: int):
+        left, right, parent = self.left, self.right, self.parent
+        color, size = self.color, self.size
+
+        if left[node] == NIL or right[node] == NIL:
+            p = parent[node]
+        else:
+            p = parent[self._tree_minimum(right[node])]
+        while p != NIL:
+            size[p] -= 1
+            p = parent[p]
+
+        y = node
+        y_original_color = color[y]
+        if left[node] == NIL:
+            x = right[node]
+            self._transplant(node, x)
+        elif right[node] == NIL:
+            x = left[node]
+            self._transplant(node, x)
+        else:
+            y = self._tree_minimum(right[node])
+            y_original_color = color[y]
+            x = right[y]
+            if parent[y] == node:
+                parent[x] = y
+            else:
+                self._transplant(y, right[y])
+                right[y] = right[node]
+                parent[right[y]] = y
+
+            self._transplant(node, y)
+            left[y] = left[node]
+            parent[left[y]] = y
+            color[y] = color[node]
+            size[y] = size[node]
+
+        if y_original_color == BLACK:
+            self._fix_delete(x)
+        self._free_node(node)
+
+    def _transplant(self, u: int, v: int):
+        pu = self.parent[u]
+        if pu == NIL:
+            self.root = v
+        elif u == self.left[pu]:
+            self.left[pu] = v
+        else:
+            self.right[pu] = v
+
+        self.parent[v] = pu
+
+    def _fix_delete(self, x: int):
+        left, right = self.left, self.right
+        parent, color = self.parent, self.color
+        while x != self.root and color[x] == BLACK:
+            p = parent[x]
+            if x == left[p]:
+                w = right[p]
+                if color[w] == RED:
+                    color[w] = BLACK
+                    color[p] = RED
+                    self._left_rotate(p)
+                    w = right[p]
+
+                if color[left[w]] == BLACK and color[right[w]] == BLACK:
+                    color[w] = RED
+                    x = p
+                else:
+                    if color[right[w]] == BLACK:
+                        color[left[w]] = BLACK
+                        color[w] = RED
+                        self._right_rotate(w)
+                        w = right[p]
+
+                    color[w] = color[p]
+                    color[p] = BLACK
+                    color[right[w]] = BLACK
+                    self._left_rotate(p)
+                    x = self.root
+            else:
+                w = left[p]
+                if color[w] == RED:
+                    color[w] = BLACK
+                    color[p] = RED
+                    self._right_rotate(p)
+                    w = left[p]
+
+                if color[right[w]] == BLACK and color[left[w]] == BLACK:
+                    color[w] = RED
+                    x = p
+                else:
+                    if color[left[w]] == BLACK:
+                        color[right[w]] = BLACK
+                        color[w] = RED
+                        self._left_rotate(w)
+                        w = left[p]
+
+                    color[w] = color[p]
+                    color[p] = BLACK
+                    color[left[w]] = BLACK
+                    self._right_rotate(p)
+                    x = self.root
+
+        color[x] = BLACK
+
+    def _tree_minimum(self, node: int) -> int:
+        left = self.left
+        while left[node] != NIL:
+            node = left[node]
+        return node
+
+    def _tree_search(self, key: int) -> int:
+        keys, left, right = self.key, self.left, self.right
+        x = self.root
+        while x != NIL and key != keys[x]:
+            if key < keys[x]:
+                x = left[x]
+            else:
+                x = right[x]
+        return x
+
+    def search(self, key: int, from_delete=False, out=print):
+        node = self._tree_search(key)
+        if node == NIL:
+            if not from_delete:
+                out(f"No node with key {key} found.")
+            return None
+        if not from_delete:
+            out(f"Node with key {key} found. Value: {self.key[node]}")
+        return node
+
+    def rank(self, key: int, out=print):
+        node = self._tree_search(key)
+        if node == NIL:
+            out(f"No node with key {key} found.")
+        else:
+            out(f"Rank of node with key {key}: {self._count_below(key) + 1}")
+
+    def _count_below(self, key: int) -> int:
+        # Number of keys < key. Duplicates are separate nodes here, so the
+        # rank of the first occurrence needs a descent that counts them all
+        # rather than a climb from whichever duplicate the search hit.
+        keys, left, right, size = self.key, self.left, self.right, self.size
+        count = 0
+        x = self.root
+        while x != NIL:
+            if key <= keys[x]:
+                x = left[x]
+            else:
+                count += size[left[x]] + 1
+                x = right[x]
+        return count
+
+    def select(self, r: int, out=print):
+        node = self._select(r)
+        if node == NIL:
+            out(f"No node at rank {r} found.")
+        else:
+            out(f"Key at rank {r}: {self.key[node]}")
+
+    def _select(self, r: int) -> int:
+        left, right, size = self.left, self.right, self.size
+        x = self.root
+        if r < 1 or r > size[x]:
+            return NIL
+        while x != NIL:
+            k = size[left[x]] + 1
+            if r == k:
+                return x
+            elif r < k:
+                x = left[x]
+            else:
+                r -= k
+                x = right[x]
+        return NIL
+
+    def inorder_traversal(self):
+        keys, left, right = self.key, self.left, self.right
+        result = []
+        stack = []
+        x = self.root
+        while stack or x != NIL:
+            if x != NIL:
+                stack.append(x)
+                x = left[x]
+            else:
+                x = stack.pop()
+                result.append(keys[x])
+                x = right[x]
+        return result
+
+
+def _measure(build, n: int) -> int:
+    tracemalloc.start()
+    tree = build(n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return current
+
+
+def _build_object_tree(n: int):
+    from DOSTree import RedBlackTree
+
+    tree = RedBlackTree()
+    for key in range(n):
+        tree.insert(key)
+    return tree
+
+
+def _build_arena_tree(n: int):
+    tree = ArenaRedBlackTree()
+    for key in range(n):
+        tree.insert(key)
+    return tree
+
+
+def memory_benchmark(sizes=(1_000_000, 10_000_000)):
+    for n in sizes:
+        for name, build in (
+            ("RedBlackTree", _build_object_tree),
+            ("ArenaRedBlackTree", _build_arena_tree),
+        ):
+            used = _measure(build, n)
+            print(
+                f"{name} n={n}: {used / n:.1f} bytes/key,"
+                f" {used / (1 << 20):.1f} MiB total"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        memory_benchmark([int(n) for n in sys.argv[1:]])
+    else:
+        memory_benchmark()
@@ -0,0 +1,182 @@
+"""
+Benchmark suite for DOSTree command workloads.
+
+Generates command streams of a given size and mix, runs them through the
+DOSTree command handlers against a RedBlackTree and reports, per scenario:
+throughput, p50/p99 latency per operation, peak RSS and the final tree
+height and size. Every scenario runs in a fresh worker process so the peak
+memory figures do not bleed into each other. The report is JSON, meant to
+be saved and diffed across versions.
+
+Usage:
+    python dostree_bench.py --sizes 10000 100000 1000000 \\
+        --mixes insert-heavy query-heavy --orders random sequential \\
+        --output bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import resource
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from DOSTree import COMMANDS, RedBlackTree
+
+# Operation weights per mix, and the fraction of the stream spent on an
+# insert-only prefill so that deletes and queries have something to hit.
+MIXES = {
+    "insert-heavy": ({b"insert": 80, b"delete": 10, b"find": 10}, 0.0),
+    "delete-heavy": ({b"insert": 20, b"delete": 80}, 0.5),
+    "query-heavy": ({b"insert": 10, b"rank": 45, b"select": 45}, 0.3),
+    "mixed": (
+        {b"insert": 40, b"delete": 20, b"find": 20, b"rank": 10, b"select": 10},
+        0.2,
+    ),
+}
+ORDERS = ("random", "sequential")
+
+# At most this many latency samples are kept per scenario
+LATENCY_SAMPLES = 200_000
+
+
+def generate_commands(n: int, mix: str, order: str, seed: int = 0):
+    # Yields n split command lines, e.g. [b"insert", b"42"]
+    weights, prefill = MIXES[mix]
+    rng = random.Random(seed)
+    operations = list(weights)
+    cumulative = []
+    total = 0
+    for operation in operations:
+        total += weights[operation]
+        cumulative.append(total)
+
+    key_space = 4 * n
+    next_key = 0  # sequential inserts
+    oldest = 0  # sequential deletes expire the oldest key first
+    live = 0  # rough live size, for picking select ranks
+
+    for i in range(n):
+        if i < n * prefill:
+            operation = b"insert"
+        else:
+            operation = rng.choices(operations, cum_weights=cumulative)[0]
+
+        if operation == b"insert":
+            if order == "sequential":
+                key = next_key
+                next_key += 1
+            else:
+                key = rng.randrange(key_space)
+            live += 1
+            yield [operation, str(key).encode()]
+        elif operation == b"delete":
+            if order == "sequential":
+                key = oldest
+                oldest += 1
+            else:
+                key = rng.randrange(key_space)
+            live = max(0, live - 1)
+            yield [operation, str(key).encode()]
+        elif operation == b"select":
+            yield [operation, str(rng.randint(1, max(1, live))).encode()]
+        else:
+            if order == "sequential":
+                key = rng.randrange(oldest, max(oldest + 1, next_key))
+            else:
+                key = rng.randrange(key_space)
+            yield [operation, str(key).encode()]
+
+
+def _percentile(samples: array, q: float) -> int:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_scenario(n: int, mix: str, order: str, seed: int = 0) -> dict:
+    rb_tree = RedBlackTree()
+    commands = COMMANDS
+    sink: list[str] = []
+    discard = sink.clear
+    sample_every = max(1, n // LATENCY_SAMPLES)
+    latencies: dict[bytes, array] = {}
+    clock = time.perf_counter_ns
+
+    start_time = time.perf_counter()
+    for i, command_line in enumerate(generate_commands(n, mix, order, seed)):
+        handler = commands[command_line[0]]
+        if i % sample_every:
+            handler(rb_tree, command_line, sink.append)
+        else:
+            started = clock()
+            handler(rb_tree, command_line, sink.append)
+            elapsed = clock() - started
+            samples = latencies.get(command_line[0])
+            if samples is None:
+                samples = latencies[command_line[0]] = array("q")
+            samples.append(elapsed)
+        if len(sink) > 1024:
+            discard()
+    elapsed_time = time.perf_counter() - start_time
+
+    return {
+        "n": n,
+        "mix": mix,
+        "order": order,
+        "seed": seed,
+        "seconds": round(elapsed_time, 6),
+        "ops_per_sec": round(n / elapsed_time, 1) if elapsed_time else None,
+        "latency_ns": {
+            operation.decode(): {
+                "samples": len(samples),
+                "p50": _percentile(samples, 0.50),
+                "p99": _percentile(samples, 0.99),
+            }
+            for operation, samples in sorted(latencies.items())
+        },
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "tree_size": rb_tree.root.size,
+        "tree_height": rb_tree.height(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DOSTree workload benchmark")
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=[1e4, 1e5, 1e6]
+    )
+    parser.add_argument("--mixes", nargs="+", choices=MIXES, default=MIXES)
+    parser.add_argument("--orders", nargs="+", choices=ORDERS, default=ORDERS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        for mix in args.mixes:
+            for order in args.orders:
+                # A fresh process per scenario keeps peak RSS per scenario
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(
+                        run_scenario, int(n), mix, order, args.seed
+                    ).result()
+                results.append(result)
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
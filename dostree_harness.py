@@ -0,0 +1,336 @@
+"""
+Differential test and speed harness for DOSTree.RedBlackTree.
+
+A randomized command stream is run through the DOSTree command handlers
+and through SortedListBaseline, a plain sorted list kept with bisect that
+prints the same messages. The harness compares every output line. After
+each batch it also checks the red-black invariants, the parent links, the
+size fields and the in-order contents of the tree against the baseline.
+
+The speed mode runs the same stream through both implementations at
+growing N and reports baseline_seconds / tree_seconds. Above 1 the tree is
+faster; below 1 the flat list still wins at that size.
+
+Usage:
+    python dostree_harness.py verify [--commands 200000] [--batch 1000] \\
+        [--seed 0] [--lazy-delete FRACTION]
+    python dostree_harness.py speed [--sizes 1e3 1e4 1e5] [--output F]
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from DOSTree import NIL, RedBlackTree, run_commands
+
+# Relative frequency of each command in a generated stream
+WEIGHTS = {
+    b"insert": 40,
+    b"delete": 20,
+    b"find": 12,
+    b"rank": 10,
+    b"select": 10,
+    b"update": 6,
+    b"delete_range": 1,
+    b"rebalance": 1,
+}
+# The speed streams leave out the whole-tree commands (rebalance is free
+# for the list, delete_range keeps clearing it), so that the structure
+# grows with N and the point operations are compared.
+SPEED_WEIGHTS = {
+    b"insert": 50,
+    b"delete": 10,
+    b"find": 15,
+    b"rank": 10,
+    b"select": 15,
+}
+
+
+class SortedListBaseline:
+    # The reference implementation: a sorted list with one entry per
+    # occurrence, and the values of the distinct keys in a dict.
+    def __init__(self):
+        self.keys: list = []
+        self.values: dict = {}
+
+    def insert(self, key, out):
+        insort(self.keys, key)
+        self.values.setdefault(key, key)
+
+    def delete(self, key, out):
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            out(f"Key {key} not found.")
+            return
+        del keys[i]
+        if i == len(keys) or keys[i] != key:
+            del self.values[key]
+        out(f"Node with key {key} deleted successfully.")
+
+    def find(self, key, out):
+        if key in self.values:
+            out(f"Node with key {key} found. Value: {self.values[key]}")
+        else:
+            out(f"No node with key {key} found.")
+
+    def rank(self, key, out):
+        if key in self.values:
+            rank = bisect_left(self.keys, key) + 1
+            out(f"Rank of node with key {key}: {rank}")
+        else:
+            out(f"No node with key {key} found.")
+
+    def select(self, r: int, out):
+        if 1 <= r <= len(self.keys):
+            out(f"Key at rank {r}: {self.keys[r - 1]}")
+        else:
+            out(f"No node at rank {r} found.")
+
+    def update(self, key, new_value, out):
+        if key in self.values:
+            self.values[key] = new_value
+            out(f"Node with key {key} updated to {new_value}.")
+        else:
+            out(f"No node with key {key} found.")
+
+    def delete_range(self, lo, hi, out):
+        removed = 0
+        if lo <= hi:
+            i = bisect_left(self.keys, lo)
+            j = bisect_right(self.keys, hi)
+            for key in set(self.keys[i:j]):
+                del self.values[key]
+            del self.keys[i:j]
+            removed = j - i
+        out(f"Deleted {removed} keys in range [{lo}, {hi}].")
+
+    def rebalance(self, out):
+        out("Tree rebalanced successfully.")
+
+    def run_commands(self, lines: list[bytes], out):
+        # Same parsing as DOSTree.run_commands
+        for line in lines:
+            command_line = line.split()
+            if not command_line:
+                continue
+            handler = BASELINE_COMMANDS.get(command_line[0])
+            if handler is not None:
+                args = [int(arg) for arg in command_line[1:]]
+                handler(self, *args, out)
+
+
+# Command name -> SortedListBaseline method, like DOSTree.COMMANDS
+BASELINE_COMMANDS = {
+    b"insert": SortedListBaseline.insert,
+    b"delete": SortedListBaseline.delete,
+    b"find": SortedListBaseline.find,
+    b"rank": SortedListBaseline.rank,
+    b"select": SortedListBaseline.select,
+    b"update": SortedListBaseline.update,
+    b"delete_range": SortedListBaseline.delete_range,
+    b"rebalance": SortedListBaseline.rebalance,
+}
+
+
+def generate_lines(
+    n: int, seed: int = 0, weights: dict = WEIGHTS, key_space: int = 0
+) -> list[bytes]:
+    # By default keys come from a space about a quarter of the stream
+    # length, so duplicates, misses and deletes of present keys all occur
+    # often.
+    rng = random.Random(seed)
+    commands = list(weights)
+    key_space = key_space or max(16, n // 4)
+    live = 0  # rough size, for picking select ranks
+    lines = []
+    for command in rng.choices(commands, list(weights.values()), k=n):
+        key = rng.randrange(key_space)
+        if command == b"insert":
+            live += 1
+            lines.append(b"insert %d" % key)
+        elif command == b"select":
+            lines.append(b"select %d" % rng.randint(0, live + 1))
+        elif command == b"update":
+            lines.append(b"update %d %d" % (key, rng.randrange(-key_space, 0)))
+        elif command == b"delete_range":
+            width = rng.randrange(key_space // 50 + 1)
+            lines.append(b"delete_range %d %d" % (key, key + width))
+        elif command == b"rebalance":
+            lines.append(b"rebalance")
+        else:
+            if command == b"delete":
+                live = max(0, live - 1)
+            lines.append(b"%s %d" % (command, key))
+    return lines
+
+
+def check_invariants(rb_tree: RedBlackTree):
+    # Raises AssertionError on the first broken red-black, parent, order,
+    # size or node-count invariant; returns the number of nodes.
+    if NIL.color != "BLACK" or NIL.size or NIL.count:
+        raise AssertionError("the NIL sentinel was modified")
+    root = rb_tree.root
+    if root != NIL and (root.color != "BLACK" or root.parent is not None):
+        raise AssertionError("root is not a black parentless node")
+
+    _, nodes, dead = _walk(rb_tree, root, None, None, None)
+    if rb_tree.dead != dead:
+        raise AssertionError(
+            f"dead is {rb_tree.dead}, the tree has {dead} tombstones"
+        )
+    if rb_tree.lazy_delete is not None and rb_tree.live != nodes - dead:
+        raise AssertionError(
+            f"live is {rb_tree.live}, the tree has {nodes - dead} live nodes"
+        )
+    return nodes
+
+
+def _walk(rb_tree: RedBlackTree, node, parent, lo, hi) -> tuple[int, int, int]:
+    # Checks the subtree at node, whose keys must lie strictly between lo
+    # and hi (None for unbounded); returns its (black height, node count,
+    # tombstones)
+    if node == NIL:
+        return 1, 0, 0
+    _check_node(rb_tree, node, parent, lo, hi)
+    left_height, left_nodes, left_dead = _walk(
+        rb_tree, node.left, node, lo, node.key
+    )
+    right_height, right_nodes, right_dead = _walk(
+        rb_tree, node.right, node, node.key, hi
+    )
+    if left_height != right_height:
+        raise AssertionError(f"black heights differ below key {node.key}")
+    height = left_height + (node.color == "BLACK")
+    dead = left_dead + right_dead + (node.count == 0)
+    return height, left_nodes + right_nodes + 1, dead
+
+
+def _check_node(rb_tree: RedBlackTree, node, parent, lo, hi):
+    # The invariants that involve only node and its neighbours
+    key = node.key
+    if node.parent is not parent:
+        raise AssertionError(f"bad parent link at key {key}")
+    if (lo is not None and key <= lo) or (hi is not None and key >= hi):
+        raise AssertionError(f"key {key} is out of order")
+    if node.count < 0 or (node.count == 0 and not rb_tree.lazy_delete):
+        raise AssertionError(f"bad count {node.count} at key {key}")
+    if node.color == "RED" and "RED" in (node.left.color, node.right.color):
+        raise AssertionError(f"red node {key} has a red child")
+    if node.size != node.left.size + node.right.size + node.count:
+        raise AssertionError(f"wrong size at key {key}")
+
+
+def verify(
+    commands: int,
+    batch: int,
+    seed: int = 0,
+    lazy_delete: float | None = None,
+) -> dict:
+    rb_tree = RedBlackTree()
+    if lazy_delete is not None:
+        rb_tree.enable_lazy_delete(lazy_delete)
+    baseline = SortedListBaseline()
+    lines = generate_lines(commands, seed)
+
+    for start in range(0, len(lines), batch):
+        chunk = lines[start : start + batch]
+        expected: list[str] = []
+        actual: list[str] = []
+        baseline.run_commands(chunk, expected.append)
+        run_commands(rb_tree, chunk, actual.append)
+        if actual != expected:
+            # Name the first output that differs
+            for i, (got, want) in enumerate(zip(actual, expected)):
+                if got != want:
+                    raise AssertionError(
+                        f"batch at command {start}, output {i} differs: "
+                        f"{got!r} != {want!r}"
+                    )
+            raise AssertionError(
+                f"batch at {start}: {len(actual)} outputs, "
+                f"expected {len(expected)}"
+            )
+        check_invariants(rb_tree)
+        if list(rb_tree) != baseline.keys:
+            raise AssertionError(f"contents differ after command {start}")
+    return {"commands": commands, "size": len(baseline.keys)}
+
+
+def speed(sizes, seed: int = 0) -> list[dict]:
+    results = []
+    for n in sizes:
+        lines = generate_lines(n, seed, SPEED_WEIGHTS, 4 * n)
+        timings = {}
+        for name, implementation in (
+            ("tree", RedBlackTree()),
+            ("baseline", SortedListBaseline()),
+        ):
+            sink: list[str] = []
+            start_time = time.perf_counter()
+            if name == "tree":
+                run_commands(implementation, lines, sink.append)
+            else:
+                implementation.run_commands(lines, sink.append)
+            timings[name] = time.perf_counter() - start_time
+        results.append(
+            {
+                "n": n,
+                "tree_seconds": round(timings["tree"], 6),
+                "baseline_seconds": round(timings["baseline"], 6),
+                "speedup": round(timings["baseline"] / timings["tree"], 3),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="DOSTree differential harness"
+    )
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    check = subparsers.add_parser("verify", help="differential test")
+    check.add_argument("--commands", type=int, default=200_000)
+    check.add_argument("--batch", type=int, default=1000)
+    check.add_argument("--seed", type=int, default=0)
+    check.add_argument("--lazy-delete", type=float, metavar="FRACTION")
+
+    bench = subparsers.add_parser("speed", help="speed against the baseline")
+    bench.add_argument(
+        "--sizes", type=float, nargs="+", default=[1e3, 1e4, 1e5]
+    )
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.mode == "verify":
+        try:
+            result = verify(
+                args.commands, args.batch, args.seed, args.lazy_delete
+            )
+        except AssertionError as error:
+            print(f"FAILED: {error}")
+            sys.exit(1)
+        print(f"OK: {result['commands']} commands, size {result['size']}")
+        return
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "results": speed([int(n) for n in args.sizes], args.seed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
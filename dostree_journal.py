@@ -0,0 +1,232 @@
+"""
+Write-ahead command journal with checkpoints for the DOSTree command stream.
+
+State lives in one directory:
+
+    checkpoint.<gen>.bin   RedBlackTree.dump() of the tree as of generation gen
+    journal.<gen>.log      mutating command lines accepted since then
+
+Each input batch is applied first, and only the mutating command lines
+that parsed and ran are appended to the current journal. The journal is
+fsync'ed once per batch (group commit) before any output for the batch is
+written, so the fsync cost is shared by every command in the batch and a
+malformed line can never reach the journal. A checkpoint
+starts a new journal generation, dumps the tree and then drops the older
+files. Recovery loads the newest checkpoint and replays only the journals
+of that generation and later.
+
+Usage: python dostree_journal.py DATA_DIR [--checkpoint-every N] < commands
+"""
+
+import argparse
+import os
+import sys
+
+from DOSTree import CHUNK_SIZE, COMMANDS, RedBlackTree
+
+# Commands that change the tree and therefore have to be journaled
+MUTATING_COMMANDS = {b"insert", b"delete", b"delete_range", b"update"}
+# Why execute_command did not run a command line
+UNKNOWN_COMMAND = "unknown command"
+MALFORMED_COMMAND = "malformed command"
+
+
+def _discard(message: str):
+    pass
+
+
+def execute_command(
+    rb_tree: RedBlackTree, command_line: list[bytes], out
+) -> str | None:
+    # Runs one split, non-empty command line through DOSTree.COMMANDS.
+    # Returns None if it ran, else UNKNOWN_COMMAND or MALFORMED_COMMAND.
+    handler = COMMANDS.get(command_line[0])
+    if handler is None:
+        return UNKNOWN_COMMAND
+    try:
+        handler(rb_tree, command_line, out)
+    except (IndexError, ValueError):
+        return MALFORMED_COMMAND
+    return None
+
+
+def apply_lines(rb_tree: RedBlackTree, lines: list[bytes], out, on_error):
+    # Runs lines like DOSTree.run_commands, except that a malformed line is
+    # passed to on_error and skipped instead of raising; unknown commands
+    # are ignored, as there. Returns the mutating lines that were applied,
+    # i.e. the ones to journal.
+    applied = []
+    for line in lines:
+        command_line = line.split()
+        if not command_line:
+            continue
+        error = execute_command(rb_tree, command_line, out)
+        if error is None:
+            if command_line[0] in MUTATING_COMMANDS:
+                applied.append(line)
+        elif error == MALFORMED_COMMAND:
+            on_error(line)
+    return applied
+
+
+class CommandJournal:
+    def __init__(self, directory: str, checkpoint_every: int = 1_000_000):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.generation = 0
+        self.since_checkpoint = 0
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind: str, generation: int) -> str:
+        extension = "bin" if kind == "checkpoint" else "log"
+        return os.path.join(
+            self.directory, f"{kind}.{generation}.{extension}"
+        )
+
+    def _generations(self, kind: str) -> list[int]:
+        generations = []
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[0] == kind and parts[1].isdigit():
+                generations.append(int(parts[1]))
+        return sorted(generations)
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def recover(self) -> RedBlackTree:
+        # Newest checkpoint plus the journal tail written after it
+        checkpoints = self._generations("checkpoint")
+        if checkpoints:
+            self.generation = checkpoints[-1]
+            tree = RedBlackTree.load(self._path("checkpoint", self.generation))
+        else:
+            tree = RedBlackTree()
+
+        for generation in self._generations("journal"):
+            if generation < self.generation:
+                continue
+            path = self._path("journal", generation)
+            with open(path, "rb") as f:
+                lines = f.readlines()
+            if lines and not lines[-1].endswith(b"\n"):
+                # Torn write from a batch that was never committed
+                lines.pop()
+                with open(path, "r+b") as f:
+                    f.truncate(sum(len(line) for line in lines))
+
+            def report(line: bytes):
+                print(f"{path}: skipping bad line {line!r}", file=sys.stderr)
+
+            apply_lines(tree, lines, _discard, report)
+            self.since_checkpoint += len(lines)
+            self.generation = generation
+
+        self._file = open(self._path("journal", self.generation), "ab")
+        return tree
+
+    def append(self, lines: list[bytes]) -> int:
+        # Buffers the mutating lines of a batch, which must already have
+        # been applied successfully; returns how many there were
+        journaled = 0
+        for line in lines:
+            command_line = line.split(None, 1)
+            if command_line and command_line[0] in MUTATING_COMMANDS:
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                self._file.write(line)
+                journaled += 1
+        self.since_checkpoint += journaled
+        return journaled
+
+    def commit(self):
+        # One fsync makes the whole batch durable
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def checkpoint(self, tree: RedBlackTree):
+        # The next generation only starts once its checkpoint is on disk;
+        # if dump() fails, the current journal simply stays in use.
+        self.commit()
+        generation = self.generation + 1
+        path = self._path("checkpoint", generation)
+        tree.dump(path + ".tmp")
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_directory()
+
+        self._file.close()
+        self.generation = generation
+        self._file = open(self._path("journal", generation), "ab")
+
+        for kind in ("checkpoint", "journal"):
+            for generation in self._generations(kind):
+                if generation < self.generation:
+                    os.remove(self._path(kind, generation))
+        self.since_checkpoint = 0
+
+    def maybe_checkpoint(self, tree: RedBlackTree):
+        # Checkpoints once checkpoint_every lines have been journaled since
+        # the last one. If the tree cannot be dumped (ValueError), the
+        # journal still has everything: the next attempt comes a full
+        # interval later instead of on every batch. OSError propagates.
+        if self.since_checkpoint < self.checkpoint_every:
+            return
+        try:
+            self.checkpoint(tree)
+        except ValueError as error:
+            print(f"checkpoint skipped: {error}", file=sys.stderr)
+            self.since_checkpoint = 0
+
+    def close(self):
+        if self._file is not None:
+            self.commit()
+            self._file.close()
+            self._file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="DOSTree command loop with a write-ahead journal"
+    )
+    parser.add_argument("directory")
+    parser.add_argument("--checkpoint-every", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    journal = CommandJournal(args.directory, args.checkpoint_every)
+    rb_tree = journal.recover()
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout
+
+    def report(line: bytes):
+        print(f"skipping malformed command {line!r}", file=sys.stderr)
+
+    results: list[str] = []
+    try:
+        while True:
+            lines = stdin.readlines(CHUNK_SIZE)
+            if not lines:
+                break
+
+            applied = apply_lines(rb_tree, lines, results.append, report)
+            if journal.append(applied):
+                journal.commit()
+            if results:
+                results.append("")
+                stdout.write("\n".join(results))
+                stdout.flush()
+                results.clear()
+
+            journal.maybe_checkpoint(rb_tree)
+    finally:
+        journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Process-parallel bulk build of an array-backed DOSTree (ArenaRedBlackTree).
+
+The input keys are range-partitioned by splitters drawn from a sample.
+Worker processes first cut their chunk of the input into one bucket per
+range. The bucket sizes tell the parent where each range starts in the
+sorted order. Then each worker sorts one range and computes the finished
+arena columns for those positions: keys, links, sizes and colours of the
+minimum-height tree over all n keys (dostree_arena.balanced_links). A
+node's links depend only on n and its position, so no worker needs
+another's results and no join is needed afterwards.
+
+Everything comes back as array("q") bytes, and the parent only
+concatenates the columns, which is a memory copy. All per-key Python work
+runs in the workers, so the build scales with the number of cores. An
+object-based RedBlackTree cannot be built this way, because Python objects
+cannot be shared between processes; its serial from_keys is the
+reference.
+
+Usage: python dostree_parallel.py N [WORKERS]
+"""
+
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from DOSTree import RedBlackTree
+from dostree_arena import ArenaRedBlackTree, balanced_links
+
+# Below this many keys the process start-up costs more than it saves
+PARALLEL_THRESHOLD = 200_000
+SAMPLES_PER_PARTITION = 64
+
+
+def _partition_chunk(data: bytes, splitters: list[int]) -> list[bytes]:
+    keys = array("q")
+    keys.frombytes(data)
+    buckets = [array("q") for _ in range(len(splitters) + 1)]
+    appends = [bucket.append for bucket in buckets]
+    for key in keys:
+        appends[bisect_right(splitters, key)](key)
+    return [bucket.tobytes() for bucket in buckets]
+
+
+def _build_partition(pieces: list[bytes], n: int, start: int) -> list[bytes]:
+    # Sorts one range, which holds the keys at positions start.. of the
+    # whole sorted input, and returns its arena columns as bytes
+    keys = array("q")
+    for piece in pieces:
+        keys.frombytes(piece)
+    keys = array("q", sorted(keys))
+    links = balanced_links(n, start, start + len(keys))
+    return [keys.tobytes()] + [bytes(column) for column in links]
+
+
+def choose_splitters(keys, partitions: int) -> list[int]:
+    # Up to partitions - 1 strictly increasing splitters drawn from a
+    # sample of keys, cutting them into ranges of about equal size. Fewer
+    # come back when the sample has too few distinct keys.
+    sample = sorted(
+        random.sample(keys, min(len(keys), partitions * SAMPLES_PER_PARTITION))
+    )
+    splitters = []
+    for i in range(1, partitions):
+        splitter = sample[i * len(sample) // partitions]
+        if not splitters or splitter > splitters[-1]:
+            splitters.append(splitter)
+    return splitters
+
+
+def parallel_from_keys(keys, workers: int | None = None) -> ArenaRedBlackTree:
+    # Same tree as ArenaRedBlackTree.from_sorted(sorted(keys)), for
+    # integer keys
+    keys = keys if isinstance(keys, array) else array("q", keys)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(keys) < PARALLEL_THRESHOLD:
+        return ArenaRedBlackTree.from_sorted(array("q", sorted(keys)))
+
+    n = len(keys)
+    splitters = choose_splitters(keys, workers)
+    step = -(-n // workers)
+    chunks = [keys[i : i + step].tobytes() for i in range(0, n, step)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        bucketed = list(
+            executor.map(_partition_chunk, chunks, [splitters] * len(chunks))
+        )
+        partitions = [
+            [buckets[i] for buckets in bucketed]
+            for i in range(len(splitters) + 1)
+        ]
+        starts = [0]
+        for pieces in partitions:
+            starts.append(starts[-1] + sum(map(len, pieces)) // 8)
+        built = list(
+            executor.map(
+                _build_partition,
+                partitions,
+                [n] * len(partitions),
+                starts[:-1],
+            )
+        )
+
+    # keys, left, right, parent and size, then the colours
+    columns = [array("q") for _ in range(5)]
+    colors = bytearray()
+    for *parts, color_data in built:
+        for column, data in zip(columns, parts):
+            column.frombytes(data)
+        colors += color_data
+    return ArenaRedBlackTree.from_sorted(columns[0], (*columns[1:], colors))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    keys = array("q", (random.randrange(n * 10) for _ in range(n)))
+
+    start_time = time.time()
+    RedBlackTree.from_keys(keys)
+    print(f"RedBlackTree.from_keys: {time.time() - start_time:.2f} seconds")
+
+    start_time = time.time()
+    ArenaRedBlackTree.from_sorted(array("q", sorted(keys)))
+    print(f"from_sorted (arena): {time.time() - start_time:.2f} seconds")
+
+    start_time = time.time()
+    parallel_from_keys(keys, workers)
+    print(f"parallel_from_keys: {time.time() - start_time:.2f} seconds")
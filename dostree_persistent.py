@@ -0,0 +1,334 @@
+"""
+Persistent (path-copying) variant of the DOSTree order-statistic tree.
+
+Nodes are never modified after they are created. An insert, delete or
+update copies only the O(log n) nodes on the root path and then publishes
+the new root with a single attribute assignment, so snapshot() is O(1) and
+a snapshot keeps answering get/rank/select/range queries on the version it
+was taken from while the writer moves on. Readers need no locks.
+
+Inserts use Okasaki's functional red-black insert; deletes split the tree
+at the key and join the two halves back together (join-based balancing,
+Blelloch et al.), both of which maintain subtree sizes on every copy.
+
+Like DOSTree.RedBlackTree, repeated keys share one node with a
+multiplicity count, and a key without an explicit value maps to itself.
+"""
+
+RED = "RED"
+BLACK = "BLACK"
+
+
+class PersistentNode:
+    __slots__ = ("key", "value", "count", "color", "left", "right", "size", "bh")
+
+    def __init__(self, key, value, count, color, left, right):
+        self.key = key
+        self.value = value
+        self.count = count
+        self.color = color
+        self.left = left
+        self.right = right
+        self.size = _size(left) + _size(right) + count
+        # Black height: black nodes from here down to a leaf, inclusive
+        self.bh = _bh(left) + (color == BLACK)
+
+
+def _size(t: PersistentNode | None) -> int:
+    return 0 if t is None else t.size
+
+
+def _bh(t: PersistentNode | None) -> int:
+    return 0 if t is None else t.bh
+
+
+def _is_red(t: PersistentNode | None) -> bool:
+    return t is not None and t.color == RED
+
+
+def _copy(t: PersistentNode, left, right, color=None) -> PersistentNode:
+    # New node carrying t's payload with the given children and colour
+    if color is None:
+        color = t.color
+    return PersistentNode(t.key, t.value, t.count, color, left, right)
+
+
+def _blacken(t: PersistentNode | None) -> PersistentNode | None:
+    if t is None or t.color == BLACK:
+        return t
+    return _copy(t, t.left, t.right, BLACK)
+
+
+def _balance(t: PersistentNode) -> PersistentNode:
+    # Okasaki's four red-red cases below a black node, all rewritten to
+    # a red node with two black children.
+    if t.color != BLACK:
+        return t
+    left, right = t.left, t.right
+    if _is_red(left):
+        if _is_red(left.left):
+            a = left.left
+            return _copy(
+                left,
+                _copy(a, a.left, a.right, BLACK),
+                _copy(t, left.right, right, BLACK),
+                RED,
+            )
+        if _is_red(left.right):
+            b = left.right
+            return _copy(
+                b,
+                _copy(left, left.left, b.left, BLACK),
+                _copy(t, b.right, right, BLACK),
+                RED,
+            )
+    if _is_red(right):
+        if _is_red(right.left):
+            b = right.left
+            return _copy(
+                b,
+                _copy(t, left, b.left, BLACK),
+                _copy(right, b.right, right.right, BLACK),
+                RED,
+            )
+        if _is_red(right.right):
+            c = right.right
+            return _copy(
+                right,
+                _copy(t, left, right.left, BLACK),
+                _copy(c, c.left, c.right, BLACK),
+                RED,
+            )
+    return t
+
+
+def _insert(t: PersistentNode | None, key, value) -> PersistentNode:
+    if t is None:
+        return PersistentNode(
+            key, key if value is None else value, 1, RED, None, None
+        )
+    if key < t.key:
+        return _balance(_copy(t, _insert(t.left, key, value), t.right))
+    if key > t.key:
+        return _balance(_copy(t, t.left, _insert(t.right, key, value)))
+    # Same key: only the multiplicity (and maybe the value) changes
+    return PersistentNode(
+        t.key,
+        t.value if value is None else value,
+        t.count + 1,
+        t.color,
+        t.left,
+        t.right,
+    )
+
+
+def _join_right(tl, m, tr):
+    # Precondition: bh(tl) > bh(tr) and tr is black. Walks down the right
+    # spine of tl to a black node with tr's black height and hangs
+    # (that node, m, tr) under a new red node, fixing red-red on the way up.
+    if tl is None or (tl.color == BLACK and tl.bh == _bh(tr)):
+        return _copy(m, tl, tr, RED)
+    t = _copy(tl, tl.left, _join_right(tl.right, m, tr))
+    if tl.color == BLACK and _is_red(t.right) and _is_red(t.right.right):
+        r = t.right
+        return _copy(
+            r,
+            _copy(t, t.left, r.left),
+            _blacken(r.right),
+            RED,
+        )
+    return t
+
+
+def _join_left(tl, m, tr):
+    # Mirror image of _join_right for bh(tr) > bh(tl)
+    if tr is None or (tr.color == BLACK and tr.bh == _bh(tl)):
+        return _copy(m, tl, tr, RED)
+    t = _copy(tr, _join_left(tl, m, tr.left), tr.right)
+    if tr.color == BLACK and _is_red(t.left) and _is_red(t.left.left):
+        left = t.left
+        return _copy(
+            left,
+            _blacken(left.left),
+            _copy(t, left.right, t.right),
+            RED,
+        )
+    return t
+
+
+def _join(tl, m, tr):
+    # Every key of tl < m.key < every key of tr; m supplies the payload
+    tl = _blacken(tl)
+    tr = _blacken(tr)
+    if _bh(tl) > _bh(tr):
+        t = _join_right(tl, m, tr)
+        return _blacken(t) if _is_red(t.right) else t
+    if _bh(tr) > _bh(tl):
+        t = _join_left(tl, m, tr)
+        return _blacken(t) if _is_red(t.left) else t
+    return _copy(m, tl, tr, BLACK)
+
+
+def _split(t, key):
+    # Returns (keys < key, node holding key or None, keys > key)
+    if t is None:
+        return None, None, None
+    if key < t.key:
+        left, found, right = _split(t.left, key)
+        return left, found, _join(right, t, t.right)
+    if key > t.key:
+        left, found, right = _split(t.right, key)
+        return _join(t.left, t, left), found, right
+    return t.left, t, t.right
+
+
+def _split_last(t):
+    # Returns (t without its maximum node, the maximum node)
+    if t.right is None:
+        return t.left, t
+    rest, last = _split_last(t.right)
+    return _join(t.left, t, rest), last
+
+
+def _join2(tl, tr):
+    if tl is None:
+        return tr
+    rest, last = _split_last(tl)
+    return _join(rest, last, tr)
+
+
+def _replace(t, key, value, count):
+    # Path copy down to key (which must be present); the shape and colours
+    # stay as they are, only the payload of key's node changes.
+    if key < t.key:
+        return _copy(t, _replace(t.left, key, value, count), t.right)
+    if key > t.key:
+        return _copy(t, t.left, _replace(t.right, key, value, count))
+    return PersistentNode(t.key, value, count, t.color, t.left, t.right)
+
+
+class Snapshot:
+    # A read-only version of the tree. Queries return values and never
+    # print, since snapshots are meant for concurrent readers.
+    def __init__(self, root: PersistentNode | None = None):
+        self.root = root
+
+    def __len__(self):
+        return _size(self.root)
+
+    def __iter__(self):
+        return self.iter_range(None, None)
+
+    def _find(self, key) -> PersistentNode | None:
+        x = self.root
+        while x is not None and key != x.key:
+            x = x.left if key < x.key else x.right
+        return x
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) is not None
+
+    def get(self, key, default=None):
+        node = self._find(key)
+        return default if node is None else node.value
+
+    def rank(self, key) -> int | None:
+        # Rank of the first occurrence of key, or None if it is absent
+        r = 0
+        x = self.root
+        while x is not None:
+            if key < x.key:
+                x = x.left
+            elif key > x.key:
+                r += _size(x.left) + x.count
+                x = x.right
+            else:
+                return r + _size(x.left) + 1
+        return None
+
+    def select(self, r: int):
+        # Key at 1-based rank r, or None if r is out of range
+        x = self.root
+        if r < 1 or r > _size(x):
+            return None
+        while x is not None:
+            k = _size(x.left)
+            if r <= k:
+                x = x.left
+            elif r <= k + x.count:
+                return x.key
+            else:
+                r -= k + x.count
+                x = x.right
+        return None
+
+    def count_range(self, lo, hi) -> int:
+        if hi < lo:
+            return 0
+        return self._count_below(hi, True) - self._count_below(lo, False)
+
+    def _count_below(self, key, inclusive: bool) -> int:
+        count = 0
+        x = self.root
+        while x is not None:
+            if key < x.key or (key == x.key and not inclusive):
+                x = x.left
+            else:
+                count += _size(x.left) + x.count
+                x = x.right
+        return count
+
+    def iter_range(self, lo, hi):
+        # Keys in [lo, hi] in order; None leaves that side unbounded
+        stack = []
+        x = self.root
+        while stack or x is not None:
+            if x is not None:
+                if lo is not None and x.key < lo:
+                    x = x.right
+                else:
+                    stack.append(x)
+                    x = x.left
+            else:
+                x = stack.pop()
+                if hi is not None and x.key > hi:
+                    return
+                for _ in range(x.count):
+                    yield x.key
+                x = x.right
+
+
+class PersistentRedBlackTree(Snapshot):
+    # The single writer. Every update builds a new version and publishes it
+    # by rebinding self.root; versions already handed out stay intact.
+    def snapshot(self) -> Snapshot:
+        return Snapshot(self.root)
+
+    def insert(self, key, value=None):
+        self.root = _blacken(_insert(self.root, key, value))
+
+    def remove(self, key) -> bool:
+        node = self._find(key)
+        if node is None:
+            return False
+        if node.count > 1:
+            self.root = _replace(self.root, key, node.value, node.count - 1)
+        else:
+            left, _, right = _split(self.root, key)
+            self.root = _blacken(_join2(left, right))
+        return True
+
+    def delete(self, key, out=print):
+        if not self.remove(key):
+            out(f"Key {key} not found.")
+            return
+
+        out(f"Node with key {key} deleted successfully.")
+
+    def update(self, key, new_value, out=print):
+        node = self._find(key)
+        if node is None:
+            out(f"No node with key {key} found.")
+        else:
+            self.root = _replace(self.root, key, new_value, node.count)
+            out(f"Node with key {key} updated to {new_value}.")
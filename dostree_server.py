@@ -0,0 +1,361 @@
+"""
+Asyncio TCP server for the DOSTree command protocol, with a load generator.
+
+Clients send the same newline-terminated commands as DOSTree.main()
+(insert, delete, delete_range, find, rank, select, rebalance, update) and
+may pipeline as many as they like without waiting. Every non-blank command
+gets exactly one response line, in order: the message the command printed,
+"OK" for commands that print nothing (insert), or "ERR ..." for unknown or
+malformed commands.
+
+Connection handlers only read and split lines; they queue them for a
+single applier task, the only code that touches the tree. The applier
+waits one event-loop tick so that everything that arrived in that tick is
+handled as one batch. It then runs the batch, commits it to the
+write-ahead journal with one fsync (with --data-dir), and only then writes
+the responses back.
+
+Each connection is flow-controlled on its own. Its handler stops reading
+while more than MAX_QUEUED_LINES of its lines wait for the applier, or
+while more than MAX_UNSENT_BYTES of its responses wait to be sent. A
+client that pipelines without reading its responses therefore stalls
+only itself, and its memory on the server stays bounded. The applier
+never waits for a client.
+
+A command that fails unexpectedly gets "ERR internal error" and the
+applier carries on. If the journal cannot be written, nothing in the
+batch is durable: all of its commands get "ERR journal write failed",
+and the server shuts down, because the tree in memory is now ahead of
+the journal.
+
+Usage:
+    python dostree_server.py serve [--port 7878] [--data-dir DIR]
+    python dostree_server.py load [--port 7878] [--clients 8] [--depth 32] \\
+        [--requests 100000] [--mix mixed]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+from DOSTree import RedBlackTree
+from dostree_bench import MIXES, generate_commands
+from dostree_journal import (
+    MUTATING_COMMANDS,
+    UNKNOWN_COMMAND,
+    CommandJournal,
+    execute_command,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7878
+# Bytes taken from a connection per read; also the longest line accepted
+READ_SIZE = 1 << 16
+# Per-connection limits past which its handler stops reading
+MAX_QUEUED_LINES = 10_000
+MAX_UNSENT_BYTES = 1 << 20
+
+
+class _Client:
+    # Flow-control state of one connection
+    def __init__(self, writer):
+        self.writer = writer
+        # Lines handed to the applier and not yet run
+        self.queued = 0
+        # Set by the applier whenever it has run some of them
+        self.room = asyncio.Event()
+
+
+class CommandServer:
+    def __init__(
+        self,
+        tree: RedBlackTree | None = None,
+        journal: CommandJournal | None = None,
+    ):
+        self.tree = RedBlackTree() if tree is None else tree
+        self.journal = journal
+        # (client, lines) in arrival order; lines is None once the client
+        # has hung up and its writer can be closed after earlier replies
+        self._pending: list = []
+        self._wakeup = asyncio.Event()
+        # Connected clients, so that shutdown can release waiting handlers
+        self._clients: set[_Client] = set()
+        self._stopping = False
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        # Serves until cancelled, or until the applier fails, whose error
+        # is then raised here
+        server = await asyncio.start_server(self._handle_client, host, port)
+        applier = asyncio.create_task(self._apply_loop())
+        async with server:
+            serving = asyncio.create_task(server.serve_forever())
+            try:
+                await asyncio.wait(
+                    (applier, serving), return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                serving.cancel()
+                applier.cancel()
+                self._disconnect_all()
+        if applier.done() and not applier.cancelled():
+            applier.result()
+
+    def _disconnect_all(self):
+        # Without an applier, no waiting handler would ever be woken up
+        self._stopping = True
+        for client in self._clients:
+            client.writer.transport.abort()
+            client.room.set()
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(writer)
+        writer.transport.set_write_buffer_limits(high=MAX_UNSENT_BYTES)
+        self._clients.add(client)
+        try:
+            await self._read_client(reader, client)
+        finally:
+            self._clients.discard(client)
+
+    async def _read_client(self, reader, client: _Client):
+        partial = b""
+        try:
+            # A line longer than READ_SIZE ends the connection
+            while len(partial) <= READ_SIZE:
+                await self._wait_for_room(client)
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                lines = (partial + data).split(b"\n")
+                partial = lines.pop()
+                if lines:
+                    self._queue(client, lines)
+        except ConnectionError:
+            pass
+        if partial and len(partial) <= READ_SIZE:
+            self._queue(client, [partial])
+        self._pending.append((client, None))
+        self._wakeup.set()
+
+    async def _wait_for_room(self, client: _Client):
+        # Blocks while the client has too many lines queued or too many
+        # response bytes unsent (drain() waits for the transport's buffer
+        # to fall below its limit)
+        while client.queued >= MAX_QUEUED_LINES and not self._stopping:
+            client.room.clear()
+            await client.room.wait()
+        await client.writer.drain()
+
+    def _queue(self, client: _Client, lines: list[bytes]):
+        client.queued += len(lines)
+        self._pending.append((client, lines))
+        self._wakeup.set()
+
+    async def _apply_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # Let every connection that is readable in this tick queue up
+            await asyncio.sleep(0)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            replies, applied = self._run_batch(batch)
+            error = self._journal_batch(applied, replies)
+            self._send_replies(batch, replies)
+            if error is not None:
+                raise error
+
+    def _send_replies(self, batch: list, replies: dict):
+        # Hands the responses to the transports without waiting for them
+        # to be sent, frees up the clients' queues and closes the clients
+        # that hung up. Slow readers are held back by _wait_for_room.
+        for client, responses in replies.items():
+            if responses and not client.writer.is_closing():
+                responses.append("")
+                client.writer.write("\n".join(responses).encode())
+        for client, lines in batch:
+            if lines is None:
+                client.writer.close()
+            else:
+                client.queued -= len(lines)
+                client.room.set()
+
+    def _run_batch(self, batch: list) -> tuple[dict, list[bytes]]:
+        # Runs the lines of a batch. Returns the responses per client and
+        # the mutating lines that ran, i.e. the ones to journal.
+        replies: dict = {}
+        applied: list[bytes] = []
+        for client, lines in batch:
+            if lines is None:
+                continue
+            responses = replies.setdefault(client, [])
+            for line in lines:
+                if self._execute(line, responses.append):
+                    applied.append(line)
+        return replies, applied
+
+    def _journal_batch(self, applied: list[bytes], replies: dict):
+        # Commits the applied lines and checkpoints when due. Returns the
+        # error that should stop the server once the replies are sent, if
+        # the journal cannot be written.
+        journal = self.journal
+        if journal is None or not applied:
+            return None
+        try:
+            journal.append(applied)
+            journal.commit()
+        except OSError as error:
+            # Not durable, so no command of the batch is acknowledged
+            print(f"journal write failed: {error}", file=sys.stderr)
+            for responses in replies.values():
+                responses[:] = ["ERR journal write failed"] * len(responses)
+            return error
+        try:
+            journal.maybe_checkpoint(self.tree)
+        except OSError as error:
+            # The batch is committed, but the journal may be unusable
+            print(f"checkpoint failed: {error}", file=sys.stderr)
+            return error
+        return None
+
+    def _execute(self, line: bytes, out) -> bool:
+        # Runs one command line and emits exactly one response for it.
+        # Returns True if it was a mutating command that ran, i.e. one to
+        # journal.
+        command_line = line.split()
+        if not command_line:
+            return False
+        responses: list[str] = []
+        try:
+            error = execute_command(self.tree, command_line, responses.append)
+        except Exception as exception:
+            # A failing handler must not take the applier down with it
+            print(f"{line!r}: {exception!r}", file=sys.stderr)
+            error = "internal error"
+        if error == UNKNOWN_COMMAND:
+            name = command_line[0].decode(errors="replace")
+            error = f"{UNKNOWN_COMMAND} {name}"
+        if error is not None:
+            out(f"ERR {error}")
+            return False
+        out("\n".join(responses) if responses else "OK")
+        return command_line[0] in MUTATING_COMMANDS
+
+
+async def _load_client(
+    host: str, port: int, commands: list[bytes], depth: int, latencies: list
+):
+    # Keeps up to depth requests in flight on one connection
+    reader, writer = await asyncio.open_connection(host, port)
+    clock = time.perf_counter_ns
+    sent_at: deque = deque()
+    i = 0
+    while i < len(commands) or sent_at:
+        if i < len(commands) and len(sent_at) < depth:
+            burst = commands[i : i + depth - len(sent_at)]
+            writer.write(b"".join(burst))
+            now = clock()
+            sent_at.extend([now] * len(burst))
+            i += len(burst)
+            await writer.drain()
+        await reader.readline()
+        latencies.append(clock() - sent_at.popleft())
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(
+    host: str,
+    port: int,
+    clients: int,
+    depth: int,
+    requests: int,
+    mix: str,
+    seed: int = 0,
+) -> dict:
+    per_client = requests // clients
+    workloads = [
+        [
+            b" ".join(command_line) + b"\n"
+            for command_line in generate_commands(
+                per_client, mix, "random", seed + c
+            )
+        ]
+        for c in range(clients)
+    ]
+    latencies: list[int] = []
+
+    start_time = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _load_client(host, port, workload, depth, latencies)
+            for workload in workloads
+        )
+    )
+    elapsed_time = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "depth": depth,
+        "requests": len(latencies),
+        "mix": mix,
+        "seconds": round(elapsed_time, 6),
+        "ops_per_sec": round(len(latencies) / elapsed_time, 1),
+        "p50_us": latencies[len(latencies) // 2] // 1000,
+        "p99_us": latencies[int(0.99 * (len(latencies) - 1))] // 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DOSTree TCP server")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    serve = subparsers.add_parser("serve", help="run the server")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--data-dir", help="journal and checkpoint directory")
+    serve.add_argument("--checkpoint-every", type=int, default=1_000_000)
+
+    load = subparsers.add_parser("load", help="run the load generator")
+    load.add_argument("--host", default=DEFAULT_HOST)
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--clients", type=int, default=8)
+    load.add_argument("--depth", type=int, default=32)
+    load.add_argument("--requests", type=int, default=100_000)
+    load.add_argument("--mix", choices=MIXES, default="mixed")
+    load.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "load":
+        report = asyncio.run(
+            run_load(
+                args.host,
+                args.port,
+                args.clients,
+                args.depth,
+                args.requests,
+                args.mix,
+                args.seed,
+            )
+        )
+        print(json.dumps(report, indent=2))
+        return
+
+    journal = None
+    tree = None
+    if args.data_dir:
+        journal = CommandJournal(args.data_dir, args.checkpoint_every)
+        tree = journal.recover()
+    try:
+        asyncio.run(CommandServer(tree, journal).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Range-sharded DOSTree across worker processes.
+
+Keys are range-partitioned by a sorted list of splitters: shard i holds
+the keys k with splitters[i - 1] <= k < splitters[i], each in its own
+RedBlackTree inside a worker process. The front-end talks to the workers
+over pipes, one message per shard per batch. A batch is sent to every
+shard involved before any reply is awaited, so the shards work on it in
+parallel.
+
+Every reply carries the shard's current size, so the front-end always
+knows the prefix sums of the shard sizes. A global rank is the number of
+keys in the shards to the left plus the rank inside the key's shard, and a
+global select finds its shard by bisecting those prefix sums.
+
+Shards drift apart as keys arrive. When the largest shard outgrows the
+mean by REBALANCE_DRIFT, neighbouring shards trade their boundary keys:
+one side splits off its top or bottom run of keys (RedBlackTree.split),
+ships them as sorted runs, and the other side concatenates them on
+(RedBlackTree.concat). The splitter between the two moves along with
+them.
+
+Usage: python dostree_shards.py N [SHARDS]
+"""
+
+import multiprocessing
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from DOSTree import RedBlackTree
+from dostree_parallel import choose_splitters
+
+# Rebalance once the largest shard exceeds the mean by this fraction...
+REBALANCE_DRIFT = 0.5
+# ...and there are enough keys for moving them around to pay off
+REBALANCE_MIN_KEYS = 4096
+
+
+class _Shard:
+    # Lives in a worker process; every public method is one RPC operation
+    def __init__(self):
+        self.tree = RedBlackTree()
+
+    def insert(self, keys: list) -> None:
+        insert = self.tree.insert
+        for key in keys:
+            insert(key)
+
+    def remove(self, keys: list) -> int:
+        remove = self.tree.remove
+        return sum(remove(key) for key in keys)
+
+    def rank(self, keys: list) -> list:
+        return self.tree.rank_many(keys)
+
+    def select(self, ranks: list) -> list:
+        return self.tree.select_many(ranks)
+
+    def _runs(self, tree: RedBlackTree) -> tuple[list, list, list]:
+        nodes = tree._inorder_nodes()
+        return (
+            [node.key for node in nodes],
+            [node.count for node in nodes],
+            [node.value for node in nodes],
+        )
+
+    def take_upper(self, count: int):
+        # Splits off the keys from the one at rank size - count + 1 up.
+        # Returns that key (the new splitter below them) and their runs.
+        size = self.tree.root.size
+        if not 0 < count < size:
+            return None, ([], [], [])
+        key = self.tree.select_many([size - count + 1])[0]
+        lower, upper = self.tree.split(key)
+        self.tree = lower
+        return key, self._runs(upper)
+
+    def take_lower(self, count: int):
+        # Splits off the keys below the one at rank count + 1, which
+        # becomes the new splitter above them.
+        if not 0 < count < self.tree.root.size:
+            return None, ([], [], [])
+        key = self.tree.select_many([count + 1])[0]
+        lower, upper = self.tree.split(key)
+        self.tree = upper
+        return key, self._runs(lower)
+
+    def put_upper(self, runs: tuple) -> None:
+        upper = RedBlackTree.from_sorted_runs(*runs)
+        self.tree = RedBlackTree.concat(self.tree, upper)
+
+    def put_lower(self, runs: tuple) -> None:
+        lower = RedBlackTree.from_sorted_runs(*runs)
+        self.tree = RedBlackTree.concat(lower, self.tree)
+
+
+def _serve_shard(conn):
+    shard = _Shard()
+    while True:
+        operation, argument = conn.recv()
+        if operation is None:
+            conn.close()
+            return
+        result = getattr(shard, operation)(argument)
+        conn.send((result, shard.tree.root.size))
+
+
+class ShardedTree:
+    def __init__(self, shards: int = 4, splitters: list | None = None):
+        if splitters is not None and len(splitters) != shards - 1:
+            raise ValueError("ShardedTree: need shards - 1 splitters")
+        # None until the first insert batch picks splitters from its keys
+        self.splitters = None if splitters is None else sorted(splitters)
+        self.sizes = [0] * shards
+        self._conns = []
+        self._processes = []
+        for _ in range(shards):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve_shard, args=(child,), daemon=True
+            )
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def close(self):
+        for conn in self._conns:
+            conn.send((None, None))
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._conns = []
+        self._processes = []
+
+    def _call(self, operation: str, arguments: dict) -> dict:
+        # One round trip to each shard in arguments, all shards in parallel
+        for shard, argument in arguments.items():
+            self._conns[shard].send((operation, argument))
+        results = {}
+        for shard in arguments:
+            results[shard], self.sizes[shard] = self._conns[shard].recv()
+        return results
+
+    def _partition(self, keys) -> tuple[dict, dict]:
+        # Groups keys by shard, remembering each one's position in keys
+        arguments: dict[int, list] = {}
+        positions: dict[int, list] = {}
+        splitters = self.splitters
+        for i, key in enumerate(keys):
+            shard = bisect_right(splitters, key)
+            if shard not in arguments:
+                arguments[shard] = []
+                positions[shard] = []
+            arguments[shard].append(key)
+            positions[shard].append(i)
+        return arguments, positions
+
+    def insert_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        if self.splitters is None:
+            # Duplicate splitters leave the shards between them empty
+            # until a rebalance hands them keys.
+            shards = len(self.sizes)
+            splitters = choose_splitters(keys, shards) or keys[:1]
+            splitters += splitters[-1:] * shards
+            self.splitters = splitters[: shards - 1]
+        self._call("insert", self._partition(keys)[0])
+        self._maybe_rebalance()
+
+    def remove_many(self, keys) -> int:
+        # Removes one occurrence per key; returns how many were present
+        if self.splitters is None:
+            return 0
+        removed = sum(self._call("remove", self._partition(keys)[0]).values())
+        self._maybe_rebalance()
+        return removed
+
+    def rank_many(self, keys) -> list[int | None]:
+        # Global ranks (first occurrence), None where a key is absent
+        keys = list(keys)
+        ranks: list[int | None] = [None] * len(keys)
+        if self.splitters is None:
+            return ranks
+        arguments, positions = self._partition(keys)
+        results = self._call("rank", arguments)
+        offsets = [0, *accumulate(self.sizes)]
+        for shard, local_ranks in results.items():
+            for i, rank in zip(positions[shard], local_ranks):
+                if rank is not None:
+                    ranks[i] = offsets[shard] + rank
+        return ranks
+
+    def select_many(self, ranks) -> list:
+        # Keys at global 1-based ranks, None where out of range
+        ranks = list(ranks)
+        keys: list = [None] * len(ranks)
+        prefix = list(accumulate(self.sizes))
+        arguments: dict[int, list] = {}
+        positions: dict[int, list] = {}
+        for i, r in enumerate(ranks):
+            if 1 <= r <= len(self):
+                shard = bisect_left(prefix, r)
+                local = r - (prefix[shard - 1] if shard else 0)
+                arguments.setdefault(shard, []).append(local)
+                positions.setdefault(shard, []).append(i)
+        for shard, local_keys in self._call("select", arguments).items():
+            for i, key in zip(positions[shard], local_keys):
+                keys[i] = key
+        return keys
+
+    def insert(self, key):
+        self.insert_many([key])
+
+    def remove(self, key) -> bool:
+        return self.remove_many([key]) == 1
+
+    def rank(self, key) -> int | None:
+        return self.rank_many([key])[0]
+
+    def select(self, r: int):
+        return self.select_many([r])[0]
+
+    def _maybe_rebalance(self):
+        total = len(self)
+        if total < REBALANCE_MIN_KEYS:
+            return
+        if max(self.sizes) > (1 + REBALANCE_DRIFT) * total / len(self.sizes):
+            self.rebalance()
+
+    def rebalance(self):
+        # Moves keys across each boundary, left to right, towards equal
+        # shard sizes. A shard can only pass on what it holds, so a skewed
+        # layout may need a few sweeps.
+        shards = len(self.sizes)
+        if self.splitters is None or shards == 1:
+            return
+        tolerance = max(1, len(self) // (8 * shards))
+        for _ in range(shards):
+            moved = False
+            total = len(self)
+            for i in range(shards - 1):
+                excess = sum(self.sizes[: i + 1]) - total * (i + 1) // shards
+                if excess > tolerance:
+                    moved |= self._move(i, i + 1, excess)
+                elif excess < -tolerance:
+                    count = min(-excess, self.sizes[i + 1])
+                    moved |= self._move(i + 1, i, count)
+            if not moved:
+                return
+
+    def _move(self, source: int, target: int, count: int) -> bool:
+        # Moves about count keys from source to its neighbour target
+        upward = target > source
+        operation = "take_upper" if upward else "take_lower"
+        key, runs = self._call(operation, {source: count})[source]
+        if not runs[0]:
+            return False
+        self._call("put_lower" if upward else "put_upper", {target: runs})
+        self.splitters[min(source, target)] = key
+        return True
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    batch = 10_000
+    keys = [random.randrange(n * 10) for _ in range(n)]
+
+    tree = RedBlackTree()
+    start_time = time.time()
+    for key in keys:
+        tree.insert(key)
+    print(f"RedBlackTree: {time.time() - start_time:.2f} seconds")
+
+    with ShardedTree(shards) as sharded:
+        start_time = time.time()
+        for i in range(0, n, batch):
+            sharded.insert_many(keys[i : i + batch])
+        print(f"ShardedTree({shards}): {time.time() - start_time:.2f} seconds")
+        print(f"shard sizes: {sharded.sizes}")
+
+        probes = random.sample(keys, 1000)
+        assert sharded.rank_many(probes) == tree.rank_many(probes)
+        ranks = [random.randint(1, n) for _ in range(1000)]
+        assert sharded.select_many(ranks) == tree.select_many(ranks)
@@ -0,0 +1,93 @@
+"""
+Rolling quantiles over a sliding window, backed by the DOSTree
+order-statistic tree.
+
+Each arrival is inserted into the tree and remembered in a FIFO; expired
+arrivals are removed again, so the tree always holds exactly the current
+window. Any quantile is then one O(log n) select instead of a sort of the
+window. Repeated values share a node (multiplicity counts), which keeps the
+tree small for typical latency data.
+
+    window = SlidingQuantile(max_count=10_000)       # last N events
+    window = SlidingQuantile(horizon=60.0)           # last 60 seconds
+    window.add(latency_ms)
+    p50, p95, p99 = window.quantiles([0.5, 0.95, 0.99])
+
+Time windows also expire arrivals when queried, so a quiet window does not
+keep answering from old data. With the implicit time.monotonic() clock
+this happens on its own; callers that pass their own timestamps to add()
+pass the current time to the queries as `now`.
+"""
+
+import math
+import time
+from collections import deque
+
+from DOSTree import RedBlackTree
+
+
+class SlidingQuantile:
+    def __init__(
+        self, max_count: int | None = None, horizon: float | None = None
+    ):
+        if max_count is None and horizon is None:
+            raise ValueError("SlidingQuantile needs max_count or horizon")
+        self.max_count = max_count
+        self.horizon = horizon
+        self.tree = RedBlackTree()
+        # (timestamp, value) in arrival order; timestamps only if timed
+        self.window: deque = deque()
+        # True once add() has stamped an arrival with time.monotonic()
+        self.implicit_clock = False
+
+    def __len__(self):
+        self._expire(None)
+        return len(self.window)
+
+    def add(self, value, timestamp: float | None = None):
+        if self.horizon is not None and timestamp is None:
+            timestamp = time.monotonic()
+            self.implicit_clock = True
+        self.window.append((timestamp, value))
+        self.tree.insert(value)
+
+        if self.max_count is not None and len(self.window) > self.max_count:
+            self.tree.remove(self.window.popleft()[1])
+        if self.horizon is not None:
+            self.evict(timestamp)
+
+    def evict(self, now: float | None = None):
+        # Drops the arrivals older than the horizon (time windows only)
+        if self.horizon is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.horizon
+        window, remove = self.window, self.tree.remove
+        while window and window[0][0] <= cutoff:
+            remove(window.popleft()[1])
+
+    def _expire(self, now: float | None):
+        # Evicts before a query: at now if given, else on the implicit clock
+        if now is not None:
+            self.evict(now)
+        elif self.implicit_clock:
+            self.evict()
+
+    def _rank(self, q: float) -> int:
+        if not 0 <= q <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+        return max(1, math.ceil(q * len(self.window)))
+
+    def quantile(self, q: float, now: float | None = None):
+        # Nearest-rank quantile of the current window, None when empty
+        self._expire(now)
+        if not self.window:
+            return None
+        return self.tree.select_many([self._rank(q)])[0]
+
+    def quantiles(self, qs, now: float | None = None) -> list:
+        self._expire(now)
+        if not self.window:
+            return [None] * len(qs)
+        return self.tree.select_many([self._rank(q) for q in qs])
@@ -0,0 +1,81 @@
+"""
+Opt-in operation counters for DOSTree.RedBlackTree.
+
+A tree mixes in TreeStats and sets self.stats = None in its __init__. Its
+hot paths bump counters only while self.stats is a dict, so disabled
+stats cost one None check per operation. get_stats() is cheap enough to
+export on every scrape: it reports the O(log n) black height, and the
+exact height, which takes an O(n) walk, only when asked for.
+
+M23CSA510_PA1/RBT.py keeps its own counters, so that the coursework tree
+stays a standalone module.
+"""
+
+# Counters kept by enable_stats()
+STAT_COUNTERS = (
+    "inserts",
+    "deletes",
+    "searches",
+    "rotations",
+    "insert_rotations",
+    "delete_rotations",
+    "fix_insert_iterations",
+    "fix_delete_iterations",
+    "search_comparisons",
+)
+# Derived averages reported by get_stats(): (name, counter, per counter)
+STAT_RATIOS = (
+    ("rotations_per_insert", "insert_rotations", "inserts"),
+    ("rotations_per_delete", "delete_rotations", "deletes"),
+    ("fix_insert_iterations_per_insert", "fix_insert_iterations", "inserts"),
+    ("fix_delete_iterations_per_delete", "fix_delete_iterations", "deletes"),
+    ("comparisons_per_search", "search_comparisons", "searches"),
+)
+
+
+class TreeStats:
+    # Needs self.root, self.NIL and nodes with left/right links
+    stats: dict[str, int] | None = None
+
+    def enable_stats(self):
+        self.stats = dict.fromkeys(STAT_COUNTERS, 0)
+
+    def disable_stats(self):
+        self.stats = None
+
+    def get_stats(self, height: bool = False) -> dict:
+        # Counters plus derived per-operation ratios and the black height,
+        # which bounds the height to [black_height, 2 * black_height]; the
+        # exact height is added with height=True
+        if self.stats is None:
+            return {}
+        stats = dict(self.stats)
+        for ratio, total, count in STAT_RATIOS:
+            stats[ratio] = stats[total] / stats[count] if stats[count] else 0.0
+        stats["black_height"] = self.black_height()
+        if height:
+            stats["height"] = self.height()
+        return stats
+
+    def black_height(self) -> int:
+        # Black nodes on every root-to-leaf path, in O(log n)
+        height = 0
+        node = self.root
+        while node != self.NIL:
+            if node.color == "BLACK":
+                height += 1
+            node = node.left
+        return height
+
+    def height(self) -> int:
+        # Nodes on the longest root-to-leaf path, found without recursion
+        height = 0
+        stack = [(self.root, 1)]
+        while stack:
+            node, depth = stack.pop()
+            if node != self.NIL:
+                if depth > height:
+                    height = depth
+                stack.append((node.left, depth + 1))
+                stack.append((node.right, depth + 1))
+        return height